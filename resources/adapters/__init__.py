@@ -0,0 +1,15 @@
+# ## Framework Adapters
+# `Resource` only relies on a small protocol of the request and response
+# objects. Werkzeug's `Request` and `Response` implement it natively. Adapters
+# for other frameworks implement the protocol on top of the framework's own
+# objects, so requests are not parsed, and responses are not copied, twice.
+#
+# The request must provide `method`, `path`, `headers` (case-insensitive
+# `in`, `[]` and `get`), `args` (`in`, `get` and `getlist`), `content_length`,
+# `content_type`, `mimetype`, `mimetype_params`, `accept_mimetypes`, `data`
+# and `stream`.
+#
+# The response must provide `headers` (`in`, `[]` and `get`), `status`,
+# `status_code`, `data`, `get_data()`, `mimetype`, `vary` (iterable, with
+# case-insensitive `in`, `add` and `update`) and `response` for streamed
+# bodies.
@@ -0,0 +1,214 @@
+# ## Django Adapter
+# Processes Django `HttpRequest` objects and writes the status, headers and
+# body directly into an `HttpResponse`, e.g.
+#
+#     from resources.adapters.django import view
+#
+#     urlpatterns = [
+#         url(r'^books/(?P<pk>\d+)/$', view(BookResource())),
+#     ]
+from __future__ import absolute_import
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import cc_delim_re, patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_options_header
+from ..http import Status
+
+
+# Request headers read on demand from `META`
+class RequestHeaders(object):
+    def __init__(self, meta):
+        self.meta = meta
+
+    @staticmethod
+    def key(name):
+        name = name.upper().replace('-', '_')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            return name
+        return 'HTTP_' + name
+
+    def __contains__(self, name):
+        return self.key(name) in self.meta
+
+    def __getitem__(self, name):
+        return self.meta[self.key(name)]
+
+    def get(self, name, default=None):
+        return self.meta.get(self.key(name), default)
+
+
+class Request(object):
+    "Thin wrapper exposing a Django `HttpRequest` to a `Resource`."
+
+    def __init__(self, request):
+        self.request = request
+        self.method = request.method
+        self.path = request.path
+        self.args = request.GET
+        self.headers = RequestHeaders(request.META)
+        self.content_type = request.META.get('CONTENT_TYPE', '')
+
+    @property
+    def content_length(self):
+        try:
+            return int(self.request.META.get('CONTENT_LENGTH') or 0) or None
+        except ValueError:
+            return None
+
+    @property
+    def mimetype(self):
+        return self._content_type[0].lower()
+
+    @property
+    def mimetype_params(self):
+        return self._content_type[1]
+
+    @property
+    def _content_type(self):
+        if '_parsed_content_type' not in self.__dict__:
+            self._parsed_content_type = parse_options_header(self.content_type)
+        return self._parsed_content_type
+
+    @property
+    def accept_mimetypes(self):
+        if '_accept_mimetypes' not in self.__dict__:
+            self._accept_mimetypes = parse_accept_header(
+                self.request.META.get('HTTP_ACCEPT'), MIMEAccept)
+        return self._accept_mimetypes
+
+    @property
+    def data(self):
+        return self.request.body
+
+    # `HttpRequest` is a file-like object which reads the input lazily
+    @property
+    def stream(self):
+        return self.request
+
+
+class ResponseHeaders(object):
+    def __init__(self, response):
+        self.response = response
+
+    def __contains__(self, name):
+        return self.response.has_header(name)
+
+    def __getitem__(self, name):
+        return self.response[name]
+
+    def __setitem__(self, name, value):
+        self.response[name] = str(value)
+
+    def __delitem__(self, name):
+        del self.response[name]
+
+    def get(self, name, default=None):
+        return self.response.get(name, default)
+
+
+# The `Vary` header as a case-insensitive set of header names
+class Vary(object):
+    def __init__(self, response):
+        self.response = response
+
+    def __iter__(self):
+        if not self.response.has_header('Vary'):
+            return iter(())
+        return iter([header for header in cc_delim_re.split(self.response['Vary'])
+            if header])
+
+    def __contains__(self, header):
+        return header.lower() in set(name.lower() for name in self)
+
+    def add(self, header):
+        patch_vary_headers(self.response, (header,))
+
+    def update(self, headers):
+        patch_vary_headers(self.response, tuple(headers))
+
+
+class Response(object):
+    "Thin wrapper writing a `Resource` response into a Django `HttpResponse`."
+
+    def __init__(self, response=None):
+        self.http_response = response if response is not None else HttpResponse()
+        self.headers = ResponseHeaders(self.http_response)
+        self.vary = Vary(self.http_response)
+        self.streaming_content = None
+
+    @property
+    def status(self):
+        return '{} {}'.format(self.http_response.status_code,
+            self.http_response.reason_phrase)
+
+    @status.setter
+    def status(self, value):
+        if isinstance(value, Status):
+            code, reason = value.code, value.reason
+        else:
+            code, _, reason = str(value).partition(' ')
+        self.http_response.status_code = int(code)
+        if reason:
+            self.http_response.reason_phrase = reason
+
+    @property
+    def status_code(self):
+        return self.http_response.status_code
+
+    @status_code.setter
+    def status_code(self, value):
+        self.http_response.status_code = value
+
+    @property
+    def mimetype(self):
+        return self.http_response['Content-Type'].split(';', 1)[0]
+
+    @mimetype.setter
+    def mimetype(self, value):
+        self.http_response['Content-Type'] = value
+
+    @property
+    def data(self):
+        return self.http_response.content
+
+    @data.setter
+    def data(self, value):
+        self.http_response.content = value
+
+    def get_data(self):
+        return self.http_response.content
+
+    # Streamed bodies require a `StreamingHttpResponse`, which is created
+    # when the response is finalized.
+    @property
+    def response(self):
+        return self.streaming_content
+
+    @response.setter
+    def response(self, value):
+        self.streaming_content = value
+
+    def finalize(self):
+        if self.streaming_content is None:
+            return self.http_response
+        response = StreamingHttpResponse(self.streaming_content,
+            status=self.http_response.status_code,
+            reason=self.http_response.reason_phrase)
+        for name, value in self.http_response.items():
+            response[name] = value
+        return response
+
+
+# Returns a Django view function for `resource`. URL arguments are passed
+# through to the resource. Like other Django API views, the view is exempt
+# from `CsrfViewMiddleware`, which would otherwise reject unsafe requests
+# from API clients. Resources authenticated by a session cookie must check
+# a CSRF token themselves.
+def view(resource):
+    @csrf_exempt
+    def dispatch(request, *args, **kwargs):
+        response = resource.handle(Request(request), Response(), *args, **kwargs)
+        return response.finalize()
+    return dispatch
@@ -0,0 +1,94 @@
+# ## Bulk Ingest
+# Incremental processing of [newline-delimited JSON][0] request entities. Items
+# are parsed one line at a time from the request stream and passed to a
+# handler in batches, so memory use is bounded by the batch size rather than
+# the size of the request. A status is reported for each item as a stream of
+# NDJSON lines, e.g.
+#
+#     {"index": 0, "status": 201}
+#     {"index": 1, "status": 400, "error": "No JSON object could be decoded"}
+#
+# [0]: http://ndjson.org
+import json
+import logging
+from itertools import islice
+
+NDJSON = 'application/x-ndjson'
+
+logger = logging.getLogger(__name__)
+
+
+# Parses the lines of `stream`, yielding a tuple of the item's index, the
+# decoded item and an error message if the line could not be decoded.
+# Blank lines are skipped.
+def iter_ndjson(stream):
+    index = 0
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            yield index, json.loads(line), None
+        except ValueError as e:
+            yield index, None, str(e)
+        index += 1
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# Converts a status, e.g. `codes.created` or `201`, to an integer code.
+def status_code(status):
+    return int(str(status).split(' ', 1)[0])
+
+
+# Streams the items in `stream` to `handler` in batches of `size` and
+# yields the status report, one chunk per batch. `handler` is called with a
+# list of decoded items and must return a status for each item, either as a
+# status (e.g. `codes.created`) or a tuple of the status and details to
+# include in the report, such as the location of the created item.
+#
+# The report is streamed after the response status has been sent, so if
+# `handler` raises, each item of that batch is reported with a 500 and
+# ingest continues with the next batch. Batches are independent, as earlier
+# ones may already have been stored.
+def ingest(stream, handler, size):
+    for batch in batches(iter_ndjson(stream), size):
+        items = [item for index, item, error in batch if error is None]
+        try:
+            results = iter(list(handler(items)) if items else ())
+            failed = False
+        except Exception:
+            logger.exception('Bulk handler failed for a batch of {} items'.format(
+                len(items)))
+            results = iter(())
+            failed = True
+        lines = []
+
+        for index, item, error in batch:
+            if error is not None:
+                report = {'index': index, 'status': 400, 'error': error}
+            elif failed:
+                report = {'index': index, 'status': 500,
+                    'error': 'The batch could not be processed'}
+            else:
+                result = next(results, None)
+                if result is None:
+                    report = {'index': index, 'status': 500,
+                        'error': 'No status was returned for the item'}
+                elif isinstance(result, tuple):
+                    report = {'index': index, 'status': status_code(result[0]),
+                        'detail': result[1]}
+                else:
+                    report = {'index': index, 'status': status_code(result)}
+            lines.append(json.dumps(report, sort_keys=True) + '\n')
+
+        yield ''.join(lines)
@@ -0,0 +1,253 @@
+# ## Shared Memory Cache
+# A cache backend stored in a memory-mapped file, shared by every process
+# on a host that opens the same path. This is intended for prefork
+# deployments, where an in-process cache of validators (ETags,
+# Last-Modified dates) or serialized representations would otherwise be
+# duplicated and warmed once per worker.
+#
+# The file holds a fixed-size table of slots grouped into small buckets. A
+# key hashes to one bucket and may occupy any slot within it. When a bucket
+# is full, a victim is chosen using the [clock algorithm][0], an
+# approximation of LRU which only requires a reference bit per slot.
+#
+# Reads are lock-free. Each slot carries a sequence number which writers
+# make odd while the slot is being modified and even once done, and readers
+# retry if the sequence changed while they were copying the value.
+# Writers are serialized across processes by an exclusive `flock` on the
+# file (and across threads by a regular lock).
+#
+# [0]: http://en.wikipedia.org/wiki/Page_replacement_algorithm#Clock
+import os
+import mmap
+import time
+import fcntl
+import struct
+import hashlib
+import threading
+
+# File header: magic, number of slots, slot size, slots per bucket
+FILE_HEADER = struct.Struct('<8sIII')
+MAGIC = b'RSRCACHE'
+
+# Slot header: sequence, reference bit, key digest, expiry timestamp
+# and length of the value.
+SLOT_HEADER = struct.Struct('<IB16sdI')
+SEQUENCE = struct.Struct('<I')
+REFERENCE = struct.Struct('<B')
+
+EMPTY = b'\0' * 16
+
+
+class SharedMemoryCache(object):
+    "Host-wide cache backed by a memory-mapped file."
+
+    # Number of attempts a reader makes before treating a slot under
+    # constant modification as a miss.
+    read_retries = 8
+
+    def __init__(self, path, slots=4096, slot_size=4096, ways=8):
+        if slots % ways:
+            raise ValueError('The number of slots must be a multiple of ways')
+        if slot_size <= SLOT_HEADER.size:
+            raise ValueError('Slot size must be greater than {}'.format(SLOT_HEADER.size))
+
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ways = ways
+        self.buckets = slots // ways
+        self.capacity = slot_size - SLOT_HEADER.size
+
+        # One clock hand per bucket follows the file header. Slots are
+        # aligned after the hands.
+        self._hands = FILE_HEADER.size
+        self._table = self._hands + self.buckets
+        self._table += -self._table % 8
+        size = self._table + slots * slot_size
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._lockfile = None
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size == 0:
+                    os.ftruncate(fd, size)
+                    os.write(fd, FILE_HEADER.pack(MAGIC, slots, slot_size, ways))
+                elif os.fstat(fd).st_size != size:
+                    raise ValueError('Cache file {} has a different layout'.format(path))
+                self._mmap = mmap.mmap(fd, size, mmap.MAP_SHARED,
+                    mmap.PROT_READ | mmap.PROT_WRITE)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+        if FILE_HEADER.unpack_from(self._mmap, 0) != (MAGIC, slots, slot_size, ways):
+            raise ValueError('Cache file {} has a different layout'.format(path))
+
+    def __repr__(self):
+        return u'<SharedMemoryCache: {}>'.format(self.path)
+
+    def _digest(self, key):
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        digest = hashlib.md5(key).digest()
+        # An all-zero digest marks an empty slot
+        if digest == EMPTY:
+            digest = b'\1' + digest[1:]
+        return digest
+
+    def _bucket(self, digest):
+        return struct.unpack_from('<I', digest)[0] % self.buckets
+
+    def _offset(self, bucket, way):
+        return self._table + (bucket * self.ways + way) * self.slot_size
+
+    # Reads a consistent copy of the slot at `offset`, returning `None`
+    # if the slot does not hold `digest`.
+    def _read(self, offset, digest):
+        mm = self._mmap
+        for _ in range(self.read_retries):
+            seq, ref, slot_digest, expires, length = SLOT_HEADER.unpack_from(mm, offset)
+            if seq & 1:
+                continue
+            if slot_digest != digest:
+                return
+            start = offset + SLOT_HEADER.size
+            value = mm[start:start + min(length, self.capacity)]
+            if SEQUENCE.unpack_from(mm, offset)[0] == seq:
+                return expires, value
+
+    # The writer lock must be held by the calling thread.
+    def _write(self, offset, digest, expires, value):
+        mm = self._mmap
+        seq = SEQUENCE.unpack_from(mm, offset)[0]
+        SEQUENCE.pack_into(mm, offset, (seq + 1) & 0xffffffff)
+        start = offset + SLOT_HEADER.size
+        mm[start:start + len(value)] = value
+        SLOT_HEADER.pack_into(mm, offset, (seq + 1) & 0xffffffff, 0, digest,
+            expires, len(value))
+        SEQUENCE.pack_into(mm, offset, (seq + 2) & 0xffffffff)
+
+    # Acquires the thread lock and the cross-process file lock. The lock file
+    # is reopened after a fork since `flock` locks are shared between
+    # processes holding the same open file description.
+    def _acquire(self):
+        self._lock.acquire()
+        try:
+            if self._pid != os.getpid():
+                self._lockfile = os.open(self.path, os.O_RDWR)
+                self._pid = os.getpid()
+            fcntl.flock(self._lockfile, fcntl.LOCK_EX)
+        except Exception:
+            self._lock.release()
+            raise
+
+    def _release(self):
+        fcntl.flock(self._lockfile, fcntl.LOCK_UN)
+        self._lock.release()
+
+    def get(self, key, default=None):
+        digest = self._digest(key)
+        bucket = self._bucket(digest)
+
+        for way in range(self.ways):
+            offset = self._offset(bucket, way)
+            entry = self._read(offset, digest)
+            if entry is None:
+                continue
+            expires, value = entry
+            if expires and expires < time.time():
+                return default
+            # Set the reference bit for the clock. This is a single byte
+            # store, so no lock is required.
+            REFERENCE.pack_into(self._mmap, offset + SEQUENCE.size, 1)
+            return value
+
+        return default
+
+    # Stores `value` (a byte string) under `key`. `timeout` is the number of
+    # seconds until the entry expires, if any. Returns `False` if the value
+    # is too large to fit in a slot.
+    def set(self, key, value, timeout=None):
+        if len(value) > self.capacity:
+            return False
+
+        digest = self._digest(key)
+        bucket = self._bucket(digest)
+        expires = time.time() + timeout if timeout else 0
+        now = time.time()
+
+        self._acquire()
+        try:
+            victim = None
+
+            for way in range(self.ways):
+                offset = self._offset(bucket, way)
+                _, _, slot_digest, slot_expires, _ = SLOT_HEADER.unpack_from(self._mmap, offset)
+                if slot_digest == digest:
+                    victim = offset
+                    break
+                if victim is None and (slot_digest == EMPTY or
+                        (slot_expires and slot_expires < now)):
+                    victim = offset
+
+            if victim is None:
+                victim = self._evict(bucket)
+
+            self._write(victim, digest, expires, value)
+        finally:
+            self._release()
+
+        return True
+
+    # Advances the bucket's clock hand, clearing reference bits, until a
+    # slot without its reference bit set is found.
+    def _evict(self, bucket):
+        mm = self._mmap
+        hand = REFERENCE.unpack_from(mm, self._hands + bucket)[0] % self.ways
+
+        while True:
+            offset = self._offset(bucket, hand)
+            hand = (hand + 1) % self.ways
+            if REFERENCE.unpack_from(mm, offset + SEQUENCE.size)[0]:
+                REFERENCE.pack_into(mm, offset + SEQUENCE.size, 0)
+                continue
+            REFERENCE.pack_into(mm, self._hands + bucket, hand)
+            return offset
+
+    def delete(self, key):
+        digest = self._digest(key)
+        bucket = self._bucket(digest)
+
+        self._acquire()
+        try:
+            for way in range(self.ways):
+                offset = self._offset(bucket, way)
+                if SLOT_HEADER.unpack_from(self._mmap, offset)[2] == digest:
+                    self._write(offset, EMPTY, 0, b'')
+                    return True
+        finally:
+            self._release()
+
+        return False
+
+    def clear(self):
+        self._acquire()
+        try:
+            for bucket in range(self.buckets):
+                for way in range(self.ways):
+                    offset = self._offset(bucket, way)
+                    if SLOT_HEADER.unpack_from(self._mmap, offset)[2] != EMPTY:
+                        self._write(offset, EMPTY, 0, b'')
+        finally:
+            self._release()
+
+    def close(self):
+        self._mmap.close()
+        if self._lockfile is not None and self._pid == os.getpid():
+            os.close(self._lockfile)
+        self._lockfile = None
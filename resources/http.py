@@ -1,72 +1,103 @@
-from .structures import AttrDict
+from werkzeug.http import parse_options_header
+from .structures import Registry
 
-methods = AttrDict(
-    'HTTP Methods',
+# ## Status
+# A status line, e.g. `404 Not Found`, with its integer `code` and `reason`
+# phrase precomputed. Being a string, it can be assigned to `response.status`
+# and compared as is. `line` is the same status line as a plain `str`, since
+# some WSGI servers reject subclasses.
+class Status(str):
+    def __new__(cls, code, reason):
+        line = '{} {}'.format(code, reason)
+        status = str.__new__(cls, line)
+        status.code = code
+        status.reason = reason
+        status.line = line
+        return status
+
+    # Copies and unpickled statuses are rebuilt from the code and reason
+    def __getnewargs__(self):
+        return self.code, self.reason
 
-    GET = 'GET',
-    HEAD = 'HEAD',
-    OPTIONS = 'OPTIONS',
-    POST = 'POST',
-    PUT = 'PUT',
-    DELETE = 'DELETE',
-    # PATCH Method introduced; ref: http://tools.ietf.org/html/rfc5789
-    PATCH = 'PATCH',
-)
 
-codes = AttrDict(
-    'HTTP Status Codes',
+methods = Registry('HTTP Methods', (
+    ('GET', 'GET'),
+    ('HEAD', 'HEAD'),
+    ('OPTIONS', 'OPTIONS'),
+    ('POST', 'POST'),
+    ('PUT', 'PUT'),
+    ('DELETE', 'DELETE'),
+    # PATCH Method introduced; ref: http://tools.ietf.org/html/rfc5789
+    ('PATCH', 'PATCH'),
+))
 
+codes = Registry('HTTP Status Codes', (
     # Informational 1xx
-    CONTINUE = '100 Continue',
-    SWITCHING_PROTOCOLS = '101 Switching Protocols',
+    ('CONTINUE', Status(100, 'Continue')),
+    ('SWITCHING_PROTOCOLS', Status(101, 'Switching Protocols')),
 
     # Successful 2xx
-    OK = '200 OK',
-    CREATED = '201 Created',
-    ACCEPTED = '202 Accepted',
-    NON_AUTHORITATIVE_INFORMATION = '203 Non-Authoritative Information',
-    NO_CONTENT = '204 No Content',
-    RESET_CONTENT = '205 Reset Content',
-    PARTIAL_CONTENT = '206 Partial Content',
+    ('OK', Status(200, 'OK')),
+    ('CREATED', Status(201, 'Created')),
+    ('ACCEPTED', Status(202, 'Accepted')),
+    ('NON_AUTHORITATIVE_INFORMATION', Status(203, 'Non-Authoritative Information')),
+    ('NO_CONTENT', Status(204, 'No Content')),
+    ('RESET_CONTENT', Status(205, 'Reset Content')),
+    ('PARTIAL_CONTENT', Status(206, 'Partial Content')),
+    # Delta encoding; ref: http://tools.ietf.org/html/rfc3229
+    ('IM_USED', Status(226, 'IM Used')),
 
     # Redirection 3xx,
-    MULTIPLE_CHOICES = '300 Multiple Choices',
-    MOVED_PERMANENTLY = '301 Moved Permanently',
-    FOUND = '302 Found',
-    SEE_OTHER = '303 See Other',
-    NOT_MODIFIED = '304 Not Modified',
-    USE_PROXY = '305 Use Proxy',
-    # UNKNOWN = '306 Unknown'),
-    TEMPORARY_REDIRECT = '307 Temporary Redirect',
+    ('MULTIPLE_CHOICES', Status(300, 'Multiple Choices')),
+    ('MOVED_PERMANENTLY', Status(301, 'Moved Permanently')),
+    ('FOUND', Status(302, 'Found')),
+    ('SEE_OTHER', Status(303, 'See Other')),
+    ('NOT_MODIFIED', Status(304, 'Not Modified')),
+    ('USE_PROXY', Status(305, 'Use Proxy')),
+    # ('UNKNOWN', Status(306, 'Unknown')),
+    ('TEMPORARY_REDIRECT', Status(307, 'Temporary Redirect')),
 
     # Client Errors 4xx,
-    BAD_REQUEST = '400 Bad Request',
-    UNAUTHORIZED = '401 Unauthorized',
-    PAYMENT_REQUIRED = '402 Payment Required',
-    FORBIDDEN = '403 Forbidden',
-    NOT_FOUND = '404 Not Found',
-    METHOD_NOT_ALLOWED = '405 Method Not Allowed',
-    NOT_ACCEPTABLE = '406 Not Acceptable',
-    PROXY_AUTHENTICATION_REQUIRED = '407 Proxy Authentication Required',
-    REQUEST_TIMEOUT = '408 Request Timeout',
-    CONFLICT = '409 Conflict',
-    GONE = '410 Gone',
-    LENGTH_REQUIRED = '411 Length Required',
-    PRECONDITION_FAILED = '412 Precondition Failed',
-    REQUEST_ENTITY_TOO_LARGE = '413 Request Entity Too Large',
-    REQUEST_URI_TOO_LONG = '414 Request-URI Too Long',
-    UNSUPPORTED_MEDIA_TYPE = '415 Unsupported Media Type',
-    REQUESTED_RANGE_NOT_SATISFIABLE = '416 Requested Range Not Satisfiable',
-    EXPECTATION_FAILED = '417 Expectation Failed',
-    UNPROCESSABLE_ENTITY = '422 Unprocessable Entity',
-    PRECONDITION_REQUIRED = '428 Precondition Required',
-    TOO_MANY_REQUESTS = '429 Too Many Requests',
+    ('BAD_REQUEST', Status(400, 'Bad Request')),
+    ('UNAUTHORIZED', Status(401, 'Unauthorized')),
+    ('PAYMENT_REQUIRED', Status(402, 'Payment Required')),
+    ('FORBIDDEN', Status(403, 'Forbidden')),
+    ('NOT_FOUND', Status(404, 'Not Found')),
+    ('METHOD_NOT_ALLOWED', Status(405, 'Method Not Allowed')),
+    ('NOT_ACCEPTABLE', Status(406, 'Not Acceptable')),
+    ('PROXY_AUTHENTICATION_REQUIRED', Status(407, 'Proxy Authentication Required')),
+    ('REQUEST_TIMEOUT', Status(408, 'Request Timeout')),
+    ('CONFLICT', Status(409, 'Conflict')),
+    ('GONE', Status(410, 'Gone')),
+    ('LENGTH_REQUIRED', Status(411, 'Length Required')),
+    ('PRECONDITION_FAILED', Status(412, 'Precondition Failed')),
+    ('REQUEST_ENTITY_TOO_LARGE', Status(413, 'Request Entity Too Large')),
+    ('REQUEST_URI_TOO_LONG', Status(414, 'Request-URI Too Long')),
+    ('UNSUPPORTED_MEDIA_TYPE', Status(415, 'Unsupported Media Type')),
+    ('REQUESTED_RANGE_NOT_SATISFIABLE', Status(416, 'Requested Range Not Satisfiable')),
+    ('EXPECTATION_FAILED', Status(417, 'Expectation Failed')),
+    ('UNPROCESSABLE_ENTITY', Status(422, 'Unprocessable Entity')),
+    ('PRECONDITION_REQUIRED', Status(428, 'Precondition Required')),
+    ('TOO_MANY_REQUESTS', Status(429, 'Too Many Requests')),
 
     # Server Errors 5xx
-    INTERNAL_SERVER_ERROR = '500 Internal Server Error',
-    NOT_IMPLEMENTED = '501 Not Implemented',
-    BAD_GATEWAY = '502 Bad Gateway',
-    SERVICE_UNAVAILABLE = '503 Service Unavailable',
-    GATEWAY_TIMEOUT = '504 Gateway Timeout',
-    HTTP_VERSION_NOT_SUPPORTED = '505 HTTP Version Not Supported',
-)
+    ('INTERNAL_SERVER_ERROR', Status(500, 'Internal Server Error')),
+    ('NOT_IMPLEMENTED', Status(501, 'Not Implemented')),
+    ('BAD_GATEWAY', Status(502, 'Bad Gateway')),
+    ('SERVICE_UNAVAILABLE', Status(503, 'Service Unavailable')),
+    ('GATEWAY_TIMEOUT', Status(504, 'Gateway Timeout')),
+    ('HTTP_VERSION_NOT_SUPPORTED', Status(505, 'HTTP Version Not Supported')),
+))
+
+
+# ## Media Type Versions
+# Parses the `version` parameter of each media range in an `Accept` header,
+# e.g. `application/json; version=2`, into a dict keyed by mimetype. Media
+# ranges without a version are omitted.
+def parse_accept_versions(value):
+    versions = {}
+    for media_range in value.split(','):
+        mimetype, options = parse_options_header(media_range)
+        if mimetype and 'version' in options:
+            versions.setdefault(mimetype.lower(), options['version'])
+    return versions
@@ -1,11 +1,57 @@
+import re
+import copy
+import uuid
+import json
+import time
+import hashlib
+from io import BytesIO
 from datetime import datetime
-from werkzeug.wrappers import Response
+from werkzeug.wrappers import Response as BaseResponse
 from werkzeug.http import http_date
-from .http import codes, methods
+from .http import Status, codes, methods, parse_accept_versions
+from .patch import JSON_PATCH, PatchError, PatchConflict, patch_engines, diff
+from .projection import Projection
+from .bulk import NDJSON, ingest
+from .structures import LRUCache
+from .refresh import RefreshPool
 
 # Convenience function for checking for existent, callable methods
 usable = lambda x, y: callable(getattr(x, y, None))
 
+# Matches versioned request method handler names, e.g. `get_v1`
+versioned_handler = re.compile(r'^([a-z]+)_v(\d\w*)$')
+
+# Sort key for version strings, e.g. `1_10` sorts after `1_9`
+version_key = lambda x: [int(y) if y.isdigit() else y for y in re.split(r'[._]', x)]
+
+# Request headers carrying credentials, which make a representation private
+credential_headers = ('Authorization', 'Cookie')
+
+# ## Versioned Handler Decorator
+# Registers the decorated method as the handler for `version` of the request
+# `method`, optionally only for the given mimetypes. This is an alternative to
+# naming handlers by convention, e.g. `get_v1`.
+def versioned(method, version, *mimetypes):
+    def decorator(func):
+        func.versions = getattr(func, 'versions', ()) + tuple((method.upper(),
+            mimetype, str(version)) for mimetype in (mimetypes or (None,)))
+        return func
+    return decorator
+
+# ## Response
+# Statuses from `codes` carry their precomputed integer code, so assigning
+# one to `response.status` does not need to parse the status line.
+class Response(BaseResponse):
+    def _set_status(self, value):
+        if isinstance(value, Status):
+            self._status = value.line
+            self._status_code = value.code
+        else:
+            BaseResponse.status.fset(self, value)
+
+    status = property(BaseResponse.status.fget, _set_status)
+
+
 # ## Resource Metaclass
 # Sets up a few helper components for the `Resource` class.
 class ResourceMetaclass(type):
@@ -17,6 +63,42 @@ class ResourceMetaclass(type):
         # classes.
         new_cls = type.__new__(cls, name, bases, attrs)
 
+        # Index versioned request method handlers by (method, mimetype,
+        # version). A mimetype of `None` applies to all supported mimetypes.
+        handlers = {}
+
+        for attr in dir(new_cls):
+            func = getattr(new_cls, attr, None)
+            if not callable(func):
+                continue
+            match = versioned_handler.match(attr)
+            if match and match.group(1) in methods:
+                handlers[(match.group(1).upper(), None, match.group(2))] = (attr,
+                    match.group(2), None)
+            for key in getattr(func, 'versions', ()):
+                handlers[key] = (attr, key[2], key[1])
+
+        # Requests that do not specify a version are handled by the
+        # unversioned handler if defined, otherwise by the latest version
+        # registered for the negotiated mimetype. The `None` mimetype default
+        # only falls back to handlers restricted to a mimetype if there are no
+        # unrestricted ones, in which case `get_handler` rejects mismatches.
+        latest = lambda keys: handlers[max(keys, key=lambda key: version_key(key[2]))]
+
+        for method in set(key[0] for key in handlers):
+            if usable(new_cls, method.lower()):
+                handlers[(method, None, None)] = (method.lower(), None, None)
+                continue
+
+            keys = [key for key in handlers if key[0] == method]
+            for mimetype in set(key[1] for key in keys if key[1] is not None):
+                handlers[(method, mimetype, None)] = latest([key for key in keys
+                    if key[1] == mimetype])
+            handlers[(method, None, None)] = latest([key for key in keys
+                if key[1] is None] or keys)
+
+        new_cls.handlers = handlers
+
         # If `allowed_methods` is not defined explicitly in attrs, this
         # could mean one of two things: that the user wants it to inherit
         # from the parent class (if exists) or for it to be set implicitly.
@@ -27,7 +109,7 @@ class ResourceMetaclass(type):
             allowed_methods = []
 
             for method in methods:
-                if usable(new_cls, method.lower()):
+                if usable(new_cls, method.lower()) or (method, None, None) in handlers:
                     allowed_methods.append(method)
 
         # If the attribute is defined in this subclass, ensure all methods that
@@ -36,7 +118,7 @@ class ResourceMetaclass(type):
             allowed_methods = list(new_cls.allowed_methods)
 
             for method in allowed_methods:
-                if not usable(new_cls, method.lower()):
+                if not usable(new_cls, method.lower()) and (method, None, None) not in handlers:
                     raise ValueError('The {} method is not defined for the '
                         'resource {}'.format(method, new_cls.__name__))
 
@@ -164,6 +246,69 @@ class Resource(object):
     # `supported_content_types`.
     supported_patch_types = None
 
+    # ### Versioned Handlers
+    # Lookup table of versioned request method handlers keyed by
+    # `(method, mimetype, version)`. This is built by the metaclass from
+    # handlers named by convention, e.g. `get_v1` and `get_v2`, or decorated
+    # with `versioned`. The version is requested using the `version` parameter
+    # of the media type, e.g. `application/json; version=2`.
+    handlers = None
+
+    # ### Projection Parameters
+    # Query parameters for requesting a sparse fieldset and the related
+    # resources to embed, e.g. `?fields=title,author&embed=author`. Handlers
+    # access the parsed projection using `get_projection`. Set to `None` to
+    # disable the respective parameter.
+    fields_param = 'fields'
+    embed_param = 'embed'
+
+    # ### Bulk Ingest
+    # If the `post_batch` handler is defined and `application/x-ndjson` is in
+    # `supported_content_types`, _POST_ requests with an NDJSON entity are
+    # streamed to `post_batch` in batches of this many items.
+    bulk_batch_size = 100
+
+    # ### Delta Encoding
+    # The number of recent _GET_ representations to retain for
+    # [delta encoding][0]. If a client sends `A-IM: json-patch` along with an
+    # `If-None-Match` containing the ETag of a retained representation, the
+    # response is a _226 IM Used_ with a JSON Patch against that version.
+    # Otherwise, or if the base version is no longer retained, the full
+    # representation is returned. Requires `get_etag` and JSON representations.
+    # Zero disables delta encoding.
+    #
+    # [0]: http://tools.ietf.org/html/rfc3229
+    delta_history = 0
+
+    # ### Representation Cache
+    # A cache backend for _GET_ representations, e.g. a `SharedMemoryCache`
+    # or an `LRUCache`. It must implement `get(key)` and
+    # `set(key, value, timeout)`. A cached representation is fresh for
+    # `cache_soft_ttl` seconds. After that, and until `cache_hard_ttl`
+    # seconds, the stale representation is served immediately while a single
+    # background re-render of the handler refreshes it, using a pool of
+    # `cache_refresh_workers` threads. The refresh is claimed in `cache` for
+    # `cache_refresh_lease` seconds, so processes sharing the cache, e.g.
+    # prefork workers, do not refresh the same representation.
+    #
+    # Representations are cached per value of the request headers the
+    # response varies on, including those listed in `cache_vary`. Requests
+    # with credentials, i.e. an `Authorization` or `Cookie` header, bypass
+    # the cache unless `cache_private` is set, in which case representations
+    # are cached per credentials and marked `private`.
+    cache = None
+    cache_soft_ttl = 60
+    cache_hard_ttl = 60 * 10
+    cache_refresh_workers = 2
+    cache_refresh_lease = 30
+    cache_vary = ()
+    cache_private = False
+
+    # ### Profiler
+    # A `resources.profiling.Profiler` instance for capturing call profiles
+    # of slow requests. If `None`, requests are not profiled.
+    profiler = None
+
 
     # ## Initialize Once, Process Many
     # Every `Resource` class can be initialized once since they are stateless
@@ -172,7 +317,19 @@ class Resource(object):
 
         # Initilize a new response for this request. Passing the response along
         # the request cycle allows for gradual modification of the headers.
-        response = Response()
+        return self.handle(request, Response(), *args, **kwargs)
+
+    # ## Handle
+    # Entry point for framework adapters which supply their own `request`
+    # and `response` objects, see `resources.adapters`.
+    def handle(self, request, response, *args, **kwargs):
+        if self.profiler is not None:
+            return self.profiler(self, request, response, *args, **kwargs)
+        return self.respond(request, response, *args, **kwargs)
+
+    # ## Respond
+    # Processes the request and returns the response.
+    def respond(self, request, response, *args, **kwargs):
 
         # Process the request, this should modify the `response`
         output = self.process(request, response, *args, **kwargs)
@@ -184,9 +341,18 @@ class Resource(object):
 
     # ## Request Programatically
     # For composite resources, `resource.apply` can be used on related resources
-    # with the original `request`.
-    def apply(self, request, *args, **kargs):
-        pass
+    # with the original `request`. Returns the output of the _GET_ handler
+    # for the given `projection`, typically the nested projection of the
+    # relation being embedded, e.g. `projection.nested('author')`. Returns
+    # `None` if the resource has no _GET_ handler.
+    def apply(self, request, *args, **kwargs):
+        response = Response()
+        response._accept_type = self.supported_accept_types[0]
+        response._projection = kwargs.pop('projection', None) or Projection()
+        handler = self.get_handler(request, response, methods.get)
+        if handler is None:
+            return
+        return handler(request, response, *args, **kwargs)
 
     def process(self, request, response, *args, **kwargs):
         # TODO keep track of a list of request headers used to
@@ -303,7 +469,8 @@ class Resource(object):
         # Check for conditional GET or HEAD request
         if request.method == methods.get or request.method == methods.head:
             if self.use_etags and 'if-none-match' in request.headers:
-                etag = self.get_etag(request, *args, **kwargs)
+                etag = self.get_projection(request, response)\
+                    .tag(self.get_etag(request, *args, **kwargs))
                 if request.headers['if-none-match'] == etag:
                     response.status = codes.not_modified
                     return
@@ -317,8 +484,28 @@ class Resource(object):
 
 
         # ### Call Request Method Handler
-        handler_output = getattr(self, request.method.lower())(request,
-            response, *args, **kwargs)
+        # The handler may have already been resolved for a versioned request.
+        # Bulk ingest requests are handled by `bulk`.
+        if request.method == methods.post and request.mimetype == NDJSON \
+                and NDJSON in self.supported_content_types \
+                and usable(self, 'post_batch'):
+            handler = self.bulk
+        else:
+            handler = getattr(response, '_handler', None) or \
+                getattr(self, request.method.lower())
+
+        if self.cache is not None and request.method == methods.get:
+            handler_output = self.cached_get(request, response, handler,
+                *args, **kwargs)
+        else:
+            handler_output = handler(request, response, *args, **kwargs)
+
+        # ### 226 IM Used
+        # Encode the representation as a delta of the client's version if
+        # requested and available.
+        if self.delta_history and request.method == methods.get:
+            handler_output = self.encode_delta(request, response, handler_output,
+                *args, **kwargs)
 
         # TODO implement post request method handling header augmentation
         if self.use_etags and 'etag' not in response.headers:
@@ -330,14 +517,51 @@ class Resource(object):
         return handler_output
 
 
+    # ## Apply Patch
+    # Applies the _PATCH_ request entity to `document` in place using the
+    # engine registered for the request `Content-Type` (JSON Patch or JSON
+    # Merge Patch). Returns the set of top-level fields that changed so the
+    # handler can persist only those. If the patch is malformed or cannot be
+    # applied, the response status is set (422 or 409 respectively) and
+    # `None` is returned. `If-Match` and `If-Unmodified-Since` preconditions
+    # have already been checked against the current state by `process`.
+    def apply_patch(self, request, response, document):
+        engine = patch_engines.get(request.mimetype)
+
+        if engine is None:
+            response.status = codes.unsupported_media_type
+            return
+
+        try:
+            return engine.loads(request.data).apply(document)
+        except PatchConflict as e:
+            response.status = codes.conflict
+            response.data = str(e)
+        except PatchError as e:
+            response.status = codes.unprocessable_entity
+            response.data = str(e)
+
     # ## Request Method Handlers
     # ### _HEAD_ Request Handler
     # Default handler for _HEAD_ requests. For this to be available,
     # a _GET_ handler must be defined.
     def head(self, request, response, *args, **kwargs):
-        self.get(request, response, *args, **kwargs)
+        self.get_handler(request, response, methods.get)(request, response,
+            *args, **kwargs)
         response.data = ''
 
+    # ### Bulk Ingest Handler
+    # Handles _POST_ requests with an NDJSON entity. All request-level checks
+    # have been performed once by `process`. Items are read incrementally from
+    # the request stream and passed to `post_batch` in batches of
+    # `bulk_batch_size`, which must return a status for each item. The
+    # response is a streamed NDJSON report of each item's status.
+    def bulk(self, request, response, *args, **kwargs):
+        handler = lambda items: self.post_batch(request, response, items,
+            *args, **kwargs)
+        response.mimetype = NDJSON
+        response.response = ingest(request.stream, handler, self.bulk_batch_size)
+
     # ### _OPTIONS_ Request Handler
     # Default handler _OPTIONS_ requests.
     def options(self, request, response, *args, **kwargs):
@@ -354,6 +578,205 @@ class Resource(object):
         response.headers['Pragma'] = 'no-cache'
 
 
+    # ## Delta Encoding
+    # Retains the current representation and, if the client requested a delta
+    # against a retained version, returns a JSON Patch from that version to the
+    # current one. Falls back to `output` if no delta can be produced or the
+    # delta would not be smaller.
+    def encode_delta(self, request, response, output, *args, **kwargs):
+        response.vary.add('A-IM')
+
+        if response.status_code != 200:
+            return output
+
+        # A cached representation is identified by the entity tag it was
+        # rendered with, which may no longer be the current one
+        if hasattr(response, '_cached_etag'):
+            etag = response._cached_etag
+        else:
+            etag = self.get_variant_etag(request, response, *args, **kwargs)
+        if etag is None:
+            return output
+
+        # History is shared across requests, keyed by the resource location,
+        # variant and entity tag.
+        history = self.__dict__.get('_delta_history') or \
+            self.__dict__.setdefault('_delta_history', LRUCache(self.delta_history))
+        key = (request.path, self.get_variant(request, response))
+        body = output if output is not None else response.get_data()
+        history.set(key + (etag,), body)
+
+        manipulations = [im.split(';', 1)[0].strip().lower()
+            for im in request.headers.get('a-im', '').split(',')]
+        if 'json-patch' not in manipulations:
+            return output
+
+        for base_etag in request.headers.get('if-none-match', '').split(','):
+            base_etag = base_etag.strip()
+            base = history.get(key + (base_etag,))
+            if base is not None:
+                break
+        else:
+            return output
+
+        try:
+            delta = json.dumps(diff(json.loads(base), json.loads(body)))
+        except (ValueError, PatchError):
+            return output
+
+        if len(delta) >= len(body):
+            return output
+
+        response.status = codes.im_used
+        response.mimetype = JSON_PATCH
+        response.headers['IM'] = 'json-patch'
+        response.headers['Delta-Base'] = base_etag
+        response.headers['ETag'] = etag
+        # Only caches which understand delta encoding may store the response
+        response.headers['Cache-Control'] = 'no-store, im'
+        return delta
+
+    # Returns the entity tag of the negotiated variant, i.e. the entity tag
+    # of the resource tagged with the projection.
+    def get_variant_etag(self, request, response, *args, **kwargs):
+        return self.get_projection(request, response)\
+            .tag(self.get_etag(request, *args, **kwargs))
+
+    # ## Representation Cache
+    # Serves the _GET_ representation from `cache` if available. Fresh
+    # representations are served as is. Stale representations within
+    # `cache_hard_ttl` are served immediately and a background refresh is
+    # scheduled. Otherwise the handler is called and its output cached.
+    def cached_get(self, request, response, handler, *args, **kwargs):
+        private = any(request.headers.get(header) for header in credential_headers)
+        if private and not self.cache_private:
+            return handler(request, response, *args, **kwargs)
+
+        for header in self.cache_vary + (credential_headers if private else ()):
+            response.vary.add(header)
+        scope = 'private, ' if private else ''
+
+        key = self.get_cache_key(request, response, *args, **kwargs)
+        entry = self.cache.get(key)
+
+        if entry is not None:
+            data, entry = entry, json.loads(entry.decode('utf-8'))
+            age = time.time() - entry['time']
+
+            if age < self.cache_hard_ttl:
+                if age < self.cache_soft_ttl:
+                    response.headers['Cache-Control'] = '{}max-age={}, ' \
+                        'stale-while-revalidate={}'.format(scope,
+                        int(self.cache_soft_ttl - age),
+                        int(self.cache_hard_ttl - self.cache_soft_ttl))
+                else:
+                    if self.claim_refresh(key, entry, age) and not \
+                            self.schedule_refresh(key, request, response, handler,
+                            *args, **kwargs):
+                        # Release the claim if the pool is saturated
+                        self.cache.set(key, data, self.cache_hard_ttl - age)
+                    response.headers['Cache-Control'] = '{}max-age=0, ' \
+                        'stale-while-revalidate={}'.format(scope,
+                        int(self.cache_hard_ttl - age))
+
+                for header, value in entry['headers']:
+                    response.headers[header] = value
+                response._cached_etag = entry.get('etag')
+                response.headers['Age'] = int(age)
+                return entry['body']
+
+        output = handler(request, response, *args, **kwargs)
+        self.cache_representation(key, request, response, output, *args, **kwargs)
+        return output
+
+    # Returns the key of the requested representation in `cache`. The values
+    # of the request headers the response varies on are hashed so that
+    # credentials are not stored in the key.
+    def get_cache_key(self, request, response, *args, **kwargs):
+        args = sorted((name, request.args.getlist(name)) for name in request.args)
+        headers = json.dumps([(name, request.headers.get(name)) for name in
+            sorted(set(header.lower() for header in response.vary))])
+        return json.dumps([self.__class__.__name__, request.path, args,
+            self.get_variant(request, response),
+            hashlib.sha1(headers.encode('utf-8')).hexdigest()])
+
+    # Stores a successful representation along with the headers describing it.
+    # Representations which the handler made vary on additional headers are
+    # not cached, since they cannot be selected by `key`.
+    def cache_representation(self, key, request, response, output, *args, **kwargs):
+        if response.status_code != 200 or \
+                key != self.get_cache_key(request, response, *args, **kwargs):
+            return
+
+        body = output if output is not None else response.get_data()
+        if isinstance(body, bytes):
+            try:
+                body = body.decode('utf-8')
+            except UnicodeDecodeError:
+                return
+        elif not isinstance(body, type(u'')):
+            return
+
+        headers = [(header, response.headers[header]) for header in
+            ('Content-Type', 'ETag', 'Last-Modified') if header in response.headers]
+        entry = {'time': time.time(), 'headers': headers, 'body': body}
+        # The entity tag of the rendered variant, for delta encoding cache hits
+        if self.delta_history:
+            entry['etag'] = self.get_variant_etag(request, response, *args, **kwargs)
+        self.cache.set(key, json.dumps(entry).encode('utf-8'), self.cache_hard_ttl)
+
+    # Claims the refresh of a stale `entry` by storing a lease in `cache`.
+    # Returns `True` if this process holds the claim, i.e. no other process
+    # holds an unexpired lease and the entry read back carries our lease. If
+    # the entry cannot be stored with the lease the refresh proceeds anyway.
+    def claim_refresh(self, key, entry, age):
+        if entry.get('lease', 0) > time.time():
+            return False
+
+        owner = uuid.uuid4().hex
+        entry = dict(entry, lease=time.time() + self.cache_refresh_lease, owner=owner)
+        if self.cache.set(key, json.dumps(entry).encode('utf-8'),
+                self.cache_hard_ttl - age) is False:
+            return True
+
+        claimed = self.cache.get(key)
+        return claimed is not None and \
+            json.loads(claimed.decode('utf-8')).get('owner') == owner
+
+    # Schedules a re-render of the representation on the refresh pool with a
+    # detached copy of the request and the negotiated state of the response.
+    # Returns `True` if the refresh was scheduled.
+    def schedule_refresh(self, key, request, response, handler, *args, **kwargs):
+        pool = self.__dict__.get('_refresh_pool') or \
+            self.__dict__.setdefault('_refresh_pool',
+                RefreshPool(self.cache_refresh_workers))
+
+        detached = Response()
+        for attr in ('_accept_type', '_accept_version', '_projection'):
+            if hasattr(response, attr):
+                setattr(detached, attr, getattr(response, attr))
+        detached.headers['Content-Type'] = response.headers['Content-Type']
+        detached.vary.update(response.vary)
+
+        return pool.submit(key, self.refresh, key, self.detach_request(request),
+            detached, handler, *args, **kwargs)
+
+    def refresh(self, key, request, response, handler, *args, **kwargs):
+        output = handler(request, response, *args, **kwargs)
+        self.cache_representation(key, request, response, output, *args, **kwargs)
+
+    # Returns a copy of `request` which can be used after the original request
+    # has completed. WSGI requests are rebuilt from a copy of the environ
+    # without the input stream. Other requests are shallow copied.
+    def detach_request(self, request):
+        environ = getattr(request, 'environ', None)
+        if environ is None:
+            return copy.copy(request)
+        environ = dict(environ)
+        environ['wsgi.input'] = BytesIO()
+        environ['CONTENT_LENGTH'] = '0'
+        return request.__class__(environ)
+
     # ## Response Status Code Handlers
     # Each handler prefixed with `check_` corresponds to various client (4xx)
     # and server (5xx) error checking. For example, `check_not_found` will
@@ -434,6 +857,16 @@ class Resource(object):
         if not self.accept_type_supported(request, response):
             return True
 
+        # Versioned handlers are resolved here since the version is negotiated
+        # along with the mimetype.
+        method = methods.get if request.method == methods.head else request.method
+        if (method, None, None) in self.handlers:
+            handler = self.get_handler(request, response, method)
+            if handler is None:
+                return True
+            if method == request.method:
+                response._handler = handler
+
         if 'accept-language' in request.headers:
             if not self.accept_language_supported(request, response):
                 return True
@@ -501,6 +934,8 @@ class Resource(object):
     def accept_type_supported(self, request, response):
         if 'accept' in request.headers:
             for mime in request.accept_mimetypes.values():
+                # Newer versions of Werkzeug keep media type parameters
+                mime = mime.split(';', 1)[0].strip()
                 if mime in self.supported_accept_types:
                     response._accept_type = mime
                     return True
@@ -516,6 +951,64 @@ class Resource(object):
             response._accept_type = self.supported_accept_types[0]
         return True
 
+    # Returns the version requested in the `Content-Type` of the request
+    # entity or, for requests without one, in the `Accept` media range of the
+    # negotiated mimetype. Returns `None` if no version was specified.
+    def get_version(self, request, response):
+        if request.content_length and 'version' in request.mimetype_params:
+            return request.mimetype_params['version']
+        if 'accept' in request.headers:
+            return parse_accept_versions(request.headers['accept'])\
+                .get(response._accept_type)
+
+    # Returns the handler for the request method and negotiated version, or
+    # `None` if the version is not supported. Versioned responses have their
+    # `Content-Type` version set and vary on `Accept`.
+    def get_handler(self, request, response, method=None):
+        method = method or request.method
+
+        if (method, None, None) not in self.handlers:
+            return getattr(self, method.lower(), None)
+
+        version = self.get_version(request, response)
+        handler = self.handlers.get((method, response._accept_type, version)) \
+            or self.handlers.get((method, None, version))
+
+        # Handlers restricted to other mimetypes cannot serve this request
+        if handler is None or handler[2] not in (None, response._accept_type):
+            return
+
+        name, version, mimetype = handler
+        response._accept_version = version
+        response.vary.add('Accept')
+        if version is not None:
+            response.headers['Content-Type'] = '{}; version={}'.format(
+                response._accept_type, version)
+        return getattr(self, name)
+
+    # Returns the projection requested using the `fields_param` and
+    # `embed_param` query parameters. The projection is parsed once per
+    # request. Entity tags of projected representations should be
+    # qualified using `projection.tag(etag)`.
+    def get_projection(self, request, response):
+        if not hasattr(response, '_projection'):
+            args = request.args
+            if (self.fields_param and self.fields_param in args) or \
+                    (self.embed_param and self.embed_param in args):
+                response._projection = Projection.parse(args,
+                    self.fields_param, self.embed_param)
+            else:
+                response._projection = Projection()
+        return response._projection
+
+    # Returns the negotiated variant of the representation, i.e. the
+    # mimetype, version and projection. This should be part of any key used
+    # to cache representations of this resource.
+    def get_variant(self, request, response):
+        return (getattr(response, '_accept_type', None),
+            getattr(response, '_accept_version', None),
+            self.get_projection(request, response).key)
+
     # Checks if the requested `Accept-Charset` is supported.
     def accept_charset_supported(self, request, response):
         return True
@@ -560,7 +1053,10 @@ class Resource(object):
 
 
     # ## Entity Content-* handlers
+    # _PATCH_ entities are checked against `supported_patch_types`.
     def content_type_supported(self, request, response, *args, **kwargs):
+        if request.method == methods.patch:
+            return request.mimetype in self.supported_patch_types
         return request.mimetype in self.supported_content_types
 
     def content_encoding_supported(self, request, response, *args, **kwargs):
@@ -0,0 +1,347 @@
+# ## Patch Engine
+# Applies [JSON Patch][0] and [JSON Merge Patch][1] documents to decoded
+# entities. A patch is validated and compiled once, then applied _in place_
+# on the target document. Applying a patch returns the set of top-level
+# fields that changed, so handlers can issue narrow updates rather than
+# rewriting the whole entity.
+#
+# [0]: http://tools.ietf.org/html/rfc6902
+# [1]: http://tools.ietf.org/html/rfc7386
+import json
+from copy import deepcopy
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+JSON_PATCH = 'application/json-patch+json'
+MERGE_PATCH = 'application/merge-patch+json'
+
+# Marker for a missing value, since `None` is a valid JSON value
+_missing = object()
+
+
+# ## Exceptions
+# `PatchError` is raised for malformed patch documents and corresponds
+# to a _422 Unprocessable Entity_. `PatchConflict` is raised when a valid
+# patch cannot be applied to the current state of the document, e.g. the
+# target path does not exist or a `test` operation fails, and corresponds to
+# a _409 Conflict_.
+class PatchError(ValueError):
+    pass
+
+
+class PatchConflict(PatchError):
+    pass
+
+
+# ## JSON Pointer
+# Parses a [JSON Pointer][0] into a tuple of reference tokens.
+#
+# [0]: http://tools.ietf.org/html/rfc6901
+def parse_pointer(pointer):
+    if not isinstance(pointer, string_types):
+        raise PatchError('Pointer must be a string')
+    if pointer == '':
+        return ()
+    if not pointer.startswith('/'):
+        raise PatchError('Pointer must start with "/": {}'.format(pointer))
+    return tuple(token.replace('~1', '/').replace('~0', '~')
+        for token in pointer[1:].split('/'))
+
+
+# Resolves a reference token against a container. For lists, `-` refers to
+# the (nonexistent) element past the end of the array when `append` is true.
+def _index(container, token, append=False):
+    if isinstance(container, dict):
+        return token
+    if isinstance(container, list):
+        if append and token == '-':
+            return len(container)
+        if not token.isdigit() or (len(token) > 1 and token[0] == '0'):
+            raise PatchConflict('Invalid array index: {}'.format(token))
+        index = int(token)
+        if index > len(container) or (not append and index == len(container)):
+            raise PatchConflict('Array index out of range: {}'.format(token))
+        return index
+    raise PatchConflict('Cannot traverse into a scalar value')
+
+
+def _resolve(document, tokens):
+    for token in tokens:
+        try:
+            document = document[_index(document, token)]
+        except (KeyError, IndexError):
+            raise PatchConflict('Path does not exist: /{}'.format('/'.join(tokens)))
+    return document
+
+
+def _get(document, tokens):
+    if not tokens:
+        return document
+    parent = _resolve(document, tokens[:-1])
+    key = _index(parent, tokens[-1])
+    try:
+        return parent[key]
+    except (KeyError, IndexError):
+        raise PatchConflict('Path does not exist: /{}'.format('/'.join(tokens)))
+
+
+def _add(document, tokens, value):
+    parent = _resolve(document, tokens[:-1])
+    key = _index(parent, tokens[-1], append=True)
+    if isinstance(parent, list):
+        parent.insert(key, value)
+    else:
+        parent[key] = value
+
+
+# Compares JSON values as [RFC 6902][0] requires for `test`, i.e. values of
+# different JSON types are never equal, so `true` does not equal `1`.
+#
+# [0]: http://tools.ietf.org/html/rfc6902#section-4.6
+def _equal(a, b):
+    if isinstance(a, bool) != isinstance(b, bool):
+        return False
+    if isinstance(a, dict) or isinstance(b, dict):
+        return isinstance(a, dict) and isinstance(b, dict) and \
+            set(a) == set(b) and all(_equal(a[key], b[key]) for key in a)
+    if isinstance(a, list) or isinstance(b, list):
+        return isinstance(a, list) and isinstance(b, list) and \
+            len(a) == len(b) and all(_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def _remove(document, tokens):
+    value = _get(document, tokens)
+    parent = _resolve(document, tokens[:-1])
+    del parent[_index(parent, tokens[-1])]
+    return value
+
+
+# ## JSON Patch
+# Compiles a list of operations. Each operation is validated up front and
+# its pointers parsed, so a compiled patch can be applied any number of
+# times without re-parsing.
+class JSONPatch(object):
+    operations = ('add', 'remove', 'replace', 'move', 'copy', 'test')
+
+    def __init__(self, operations):
+        if not isinstance(operations, list):
+            raise PatchError('JSON Patch must be an array of operations')
+        self.compiled = [self.compile(operation) for operation in operations]
+
+    @classmethod
+    def loads(cls, data):
+        try:
+            return cls(json.loads(data))
+        except ValueError as e:
+            if isinstance(e, PatchError):
+                raise
+            raise PatchError('Patch is not valid JSON')
+
+    def compile(self, operation):
+        if not isinstance(operation, dict):
+            raise PatchError('Operation must be an object')
+
+        op = operation.get('op')
+        if op not in self.operations:
+            raise PatchError('Unknown operation: {}'.format(op))
+        if 'path' not in operation:
+            raise PatchError('Operation "{}" requires a "path"'.format(op))
+
+        path = parse_pointer(operation['path'])
+        source = value = None
+
+        if op in ('add', 'replace', 'test'):
+            if 'value' not in operation:
+                raise PatchError('Operation "{}" requires a "value"'.format(op))
+            value = operation['value']
+
+        elif op in ('move', 'copy'):
+            if 'from' not in operation:
+                raise PatchError('Operation "{}" requires a "from"'.format(op))
+            source = parse_pointer(operation['from'])
+            if op == 'move' and path[:len(source)] == source and path != source:
+                raise PatchError('Cannot move a value into one of its children')
+
+        if not path and op != 'test':
+            raise PatchError('Operations on the whole document are not supported')
+
+        return op, path, source, value
+
+    # Applies the compiled operations to `document` in place and returns the
+    # set of top-level fields that were changed. Operations are applied
+    # atomically: only the top-level fields about to be modified are copied
+    # beforehand, and they are restored if any operation fails.
+    def apply(self, document):
+        if not isinstance(document, dict):
+            working = deepcopy(document)
+            changed = self._apply(working, None)
+            document[:] = working
+            return changed
+
+        saved = {}
+        try:
+            return self._apply(document, saved)
+        except PatchError:
+            for key, value in saved.items():
+                if value is _missing:
+                    document.pop(key, None)
+                else:
+                    document[key] = value
+            raise
+
+    def _apply(self, document, saved):
+        changed = set()
+
+        def touch(key):
+            if saved is not None and key not in saved:
+                value = document.get(key, _missing)
+                saved[key] = value if value is _missing else deepcopy(value)
+            changed.add(key)
+
+        for op, path, source, value in self.compiled:
+            if op == 'test':
+                if not _equal(_get(document, path), value):
+                    raise PatchConflict('Test failed: /{}'.format('/'.join(path)))
+                continue
+
+            if op == 'move':
+                touch(source[0])
+            touch(path[0])
+
+            if op == 'add':
+                _add(document, path, deepcopy(value))
+            elif op == 'remove':
+                _remove(document, path)
+            elif op == 'replace':
+                _get(document, path)
+                parent = _resolve(document, path[:-1])
+                parent[_index(parent, path[-1])] = deepcopy(value)
+            elif op == 'move':
+                _add(document, path, _remove(document, source))
+            elif op == 'copy':
+                _add(document, path, deepcopy(_get(document, source)))
+
+        return changed
+
+
+# ## JSON Merge Patch
+# A merge patch is itself the target shape: object members are recursively
+# merged, `null` removes a member and any other value replaces it.
+class MergePatch(object):
+    def __init__(self, patch):
+        if not isinstance(patch, dict):
+            raise PatchError('Merge patch must be an object')
+        self.patch = patch
+
+    @classmethod
+    def loads(cls, data):
+        try:
+            return cls(json.loads(data))
+        except ValueError as e:
+            if isinstance(e, PatchError):
+                raise
+            raise PatchError('Patch is not valid JSON')
+
+    # Merges the patch into `document` in place and returns the set of
+    # top-level fields that were changed.
+    def apply(self, document):
+        if not isinstance(document, dict):
+            raise PatchConflict('Merge patch target must be an object')
+
+        changed = set()
+        for key, value in self.patch.items():
+            if _merge(document, key, value):
+                changed.add(key)
+        return changed
+
+
+def _merge(target, key, value):
+    current = target.get(key, _missing)
+
+    if value is None:
+        if current is _missing:
+            return False
+        del target[key]
+        return True
+
+    if isinstance(value, dict):
+        if not isinstance(current, dict):
+            current = target[key] = {}
+            changed = True
+        else:
+            changed = False
+        for k, v in value.items():
+            changed = _merge(current, k, v) or changed
+        return changed
+
+    if current is not _missing and current == value:
+        return False
+    target[key] = deepcopy(value)
+    return True
+
+
+# ## Diff
+# Computes a JSON Patch which transforms `source` into `target`. Objects are
+# compared member by member. For arrays, the common prefix and suffix are
+# skipped and the remaining elements are compared pairwise, with trailing
+# elements added or removed, so appending to a collection produces only
+# `add` operations.
+def escape_token(token):
+    return token.replace('~', '~0').replace('/', '~1')
+
+
+def diff(source, target, path=''):
+    if source == target:
+        return []
+
+    if isinstance(source, dict) and isinstance(target, dict):
+        operations = []
+        for key in sorted(source):
+            if key not in target:
+                operations.append({'op': 'remove', 'path': path + '/' + escape_token(key)})
+        for key in sorted(target):
+            pointer = path + '/' + escape_token(key)
+            if key not in source:
+                operations.append({'op': 'add', 'path': pointer, 'value': target[key]})
+            else:
+                operations.extend(diff(source[key], target[key], pointer))
+        return operations
+
+    if isinstance(source, list) and isinstance(target, list):
+        prefix = 0
+        limit = min(len(source), len(target))
+        while prefix < limit and source[prefix] == target[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and \
+                source[-1 - suffix] == target[-1 - suffix]:
+            suffix += 1
+
+        old = source[prefix:len(source) - suffix]
+        new = target[prefix:len(target) - suffix]
+        operations = []
+
+        for i in range(min(len(old), len(new))):
+            operations.extend(diff(old[i], new[i], '{}/{}'.format(path, prefix + i)))
+        for i in range(len(new), len(old)):
+            operations.append({'op': 'remove', 'path': '{}/{}'.format(path, prefix + len(new))})
+        for i in range(len(old), len(new)):
+            operations.append({'op': 'add', 'path': '{}/{}'.format(path, prefix + i),
+                'value': new[i]})
+        return operations
+
+    if not path:
+        raise PatchError('The whole document cannot be replaced by a patch')
+
+    return [{'op': 'replace', 'path': path, 'value': target}]
+
+
+# Patch engines keyed by the `Content-Type` of the request entity
+patch_engines = {
+    JSON_PATCH: JSONPatch,
+    MERGE_PATCH: MergePatch,
+}
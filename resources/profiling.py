@@ -0,0 +1,219 @@
+# ## Slow Request Profiler
+# Captures `cProfile` call profiles for outlier requests. A `Profiler` is
+# assigned to `Resource.profiler` and decides per request whether to
+# profile it:
+#
+# * `sample_rate` - the fraction of requests to profile with `cProfile`,
+#   e.g. `0.01`
+# * `threshold` - if set, every request taking at least this many seconds is
+#   captured, and sampled profiles of faster requests are discarded
+#
+# `cProfile` typically slows the profiled request down by a factor of two or
+# more, so it is only used for sampled requests. Requests which are not
+# sampled are captured by a stack sampler instead: a watchdog thread wakes
+# every `interval` seconds and takes a snapshot of the stack of each request
+# which has been running for longer than `threshold`. Until then, the only
+# cost is registering the request with the watchdog. The resulting profile
+# attributes time by the number of samples a function appears in, so it
+# covers only the time past the threshold and is as coarse as `interval`.
+#
+# For each resource and method, only the `keep` slowest profiles are
+# retained. A resource without a profiler, or a request that is not sampled
+# when there is no `threshold`, is processed without any profiling overhead.
+import os
+import sys
+import heapq
+import random
+import pstats
+import cProfile
+import itertools
+import threading
+from time import time, sleep
+
+try:
+    from thread import get_ident
+except ImportError:
+    from threading import get_ident
+
+
+class ProfileEntry(object):
+    "A captured profile for a single request."
+
+    def __init__(self, resource, method, path, duration, timestamp, stats):
+        self.resource = resource
+        self.method = method
+        self.path = path
+        self.duration = duration
+        self.timestamp = timestamp
+        self.stats = stats
+
+    def __repr__(self):
+        return u'<ProfileEntry: {} {} {:.3f}s>'.format(self.method, self.path,
+            self.duration)
+
+
+# ## Stack Samples
+# The stacks sampled from a slow request. Implements `create_stats` so it can
+# be loaded by `pstats.Stats` like a `cProfile.Profile`; each sample counts
+# as one call and `interval` seconds of the functions on the stack.
+class StackSamples(object):
+    def __init__(self, start, interval):
+        self.start = start
+        self.interval = interval
+        self.samples = []
+
+    # Appends the stack of `frame`, outermost call first
+    def sample(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        stack.reverse()
+        self.samples.append(tuple(stack))
+
+    def create_stats(self):
+        entries = {}
+        for stack in list(self.samples):
+            for depth, func in enumerate(stack):
+                top = depth == len(stack) - 1
+                entry = entries.setdefault(func, [0, 0, 0.0, 0.0, {}])
+                # Recursive functions count once per sample
+                if func not in stack[depth + 1:]:
+                    entry[0] += 1
+                    entry[1] += 1
+                    entry[3] += self.interval
+                if top:
+                    entry[2] += self.interval
+                if depth:
+                    caller = entry[4].setdefault(stack[depth - 1], [0, 0, 0.0, 0.0])
+                    caller[0] += 1
+                    caller[1] += 1
+                    caller[2] += self.interval if top else 0
+                    caller[3] += self.interval
+        self.stats = dict((func, (cc, nc, tt, ct, dict((caller, tuple(value))
+            for caller, value in callers.items())))
+            for func, (cc, nc, tt, ct, callers) in entries.items())
+
+
+class Profiler(object):
+    def __init__(self, sample_rate=0, threshold=None, keep=10, interval=0.005):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.keep = keep
+        self.interval = interval
+        self._lock = threading.Lock()
+        # Requests watched by the stack sampler, keyed by thread
+        self._watched = {}
+        self._pid = None
+        # Min-heaps of (duration, counter, entry) keyed by (resource, method)
+        # so the fastest retained profile is evicted first.
+        self._profiles = {}
+        self._counter = itertools.count()
+
+    def sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, resource, request, *args, **kwargs):
+        if not self.sampled():
+            if self.threshold is None:
+                return resource.respond(request, *args, **kwargs)
+            return self.watch(resource, request, *args, **kwargs)
+
+        profile = cProfile.Profile()
+        start = time()
+        profile.enable()
+        try:
+            return resource.respond(request, *args, **kwargs)
+        finally:
+            profile.disable()
+            duration = time() - start
+            self.record(resource, request, duration, start, profile)
+
+    # Processes the request while the watchdog samples its stack once it
+    # exceeds `threshold`.
+    def watch(self, resource, request, *args, **kwargs):
+        if self._pid != os.getpid():
+            self._start_watchdog()
+
+        ident = get_ident()
+        samples = self._watched[ident] = StackSamples(time(), self.interval)
+        try:
+            return resource.respond(request, *args, **kwargs)
+        finally:
+            del self._watched[ident]
+            if samples.samples:
+                self.record(resource, request, time() - samples.start,
+                    samples.start, samples)
+
+    # Threads do not survive a `fork`, so the watchdog is started when the
+    # profiler is first used in each process.
+    def _start_watchdog(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._watched = {}
+            thread = threading.Thread(target=self._watchdog)
+            thread.daemon = True
+            thread.start()
+            self._pid = os.getpid()
+
+    def _watchdog(self):
+        while True:
+            sleep(self.interval)
+            now = time()
+            frames = None
+            for ident, samples in list(self._watched.items()):
+                if self.threshold is None or now - samples.start < self.threshold:
+                    continue
+                frames = frames or sys._current_frames()
+                if ident in frames:
+                    samples.sample(frames[ident])
+
+    def record(self, resource, request, duration, timestamp, profile):
+        if self.threshold is not None and duration < self.threshold:
+            return
+
+        key = (resource.__class__.__name__, request.method)
+
+        with self._lock:
+            heap = self._profiles.setdefault(key, [])
+            if len(heap) >= self.keep and duration <= heap[0][0]:
+                return
+
+        # Building the stats is the expensive part, so it is done outside
+        # the lock and only for profiles that will be retained.
+        entry = ProfileEntry(key[0], key[1], request.path, duration, timestamp,
+            pstats.Stats(profile))
+
+        with self._lock:
+            item = (duration, next(self._counter), entry)
+            if len(heap) < self.keep:
+                heapq.heappush(heap, item)
+            elif duration > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+    # Returns the retained profiles, slowest first, optionally filtered
+    # by resource class name and request method.
+    def profiles(self, resource=None, method=None):
+        with self._lock:
+            entries = [item[2] for key, heap in self._profiles.items()
+                if (resource is None or key[0] == resource) and
+                    (method is None or key[1] == method)
+                for item in heap]
+        return sorted(entries, key=lambda entry: entry.duration, reverse=True)
+
+    # Writes the aggregate of the matching profiles to `path` in the
+    # `pstats` format. Returns `False` if there was nothing to dump.
+    def dump(self, path, resource=None, method=None):
+        entries = self.profiles(resource, method)
+        if not entries:
+            return False
+        stats = pstats.Stats()
+        stats.add(*[entry.stats for entry in entries])
+        stats.dump_stats(path)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
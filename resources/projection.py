@@ -0,0 +1,99 @@
+# ## Projection
+# The sparse fieldset and embedded relations requested by the client using
+# the `fields` and `embed` query parameters, e.g.
+# `?fields=title,author.name&embed=author`. Fields of embedded relations are
+# prefixed with the relation name.
+#
+# A `Projection` is parsed once per request and is immutable. Handlers should
+# check it before fetching or serializing fields and relations, so those that
+# were not requested are never computed.
+import hashlib
+
+
+def _split(values):
+    items = set()
+    for value in values:
+        items.update(item.strip() for item in value.split(',') if item.strip())
+    return items
+
+
+class Projection(object):
+    "Requested fields and embedded relations of a representation."
+
+    def __init__(self, fields=None, embed=None):
+        # `None` means all fields were requested
+        self.fields = frozenset(fields) if fields is not None else None
+        self.embed = frozenset(embed or ())
+
+        # Canonical form used for cache keys and entity tags
+        if self.fields is None and not self.embed:
+            self.key = ''
+        else:
+            self.key = 'fields={};embed={}'.format(
+                '*' if self.fields is None else ','.join(sorted(self.fields)),
+                ','.join(sorted(self.embed)))
+
+    # Parses a projection from the request query arguments. Parameters
+    # may be repeated or contain comma-separated values.
+    @classmethod
+    def parse(cls, args, fields_param='fields', embed_param='embed'):
+        fields = args.getlist(fields_param)
+        embed = args.getlist(embed_param)
+        return cls(_split(fields) if fields else None, _split(embed))
+
+    def __repr__(self):
+        return u'<Projection: {}>'.format(self.key or '*')
+
+    # A projection is true if it restricts the default representation
+    def __nonzero__(self):
+        return bool(self.key)
+
+    __bool__ = __nonzero__
+
+    def __eq__(self, other):
+        return isinstance(other, Projection) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key)
+
+    # Returns true if `field` should be included in the representation.
+    # Embedded relations are included if requested by either parameter.
+    def __contains__(self, field):
+        return self.fields is None or field in self.fields or field in self.embed
+
+    # Returns true if `relation` should be embedded rather than referenced.
+    def embeds(self, relation):
+        return relation in self.embed
+
+    # Returns the projection for the embedded `relation`, e.g. the fields
+    # `author.name` and `author.email` become `name` and `email`. If no
+    # fields of the relation were requested, all fields are included.
+    def nested(self, relation):
+        prefix = relation + '.'
+        strip = lambda items: set(item[len(prefix):] for item in items
+            if item.startswith(prefix))
+        fields = strip(self.fields or ())
+        return Projection(fields or None, strip(self.embed))
+
+    # Filters a dict (or list of dicts) to the requested fields. This is a
+    # fallback for data that was already fully computed.
+    def filter(self, data):
+        if self.fields is None and not self.embed:
+            return data
+        if isinstance(data, list):
+            return [self.filter(item) for item in data]
+        return dict((key, value) for key, value in data.items() if key in self)
+
+    # Returns `etag` qualified by this projection so that each projection of
+    # a representation has a distinct entity tag. Unrestricted projections
+    # return `etag` unchanged.
+    def tag(self, etag):
+        if not self.key or etag is None:
+            return etag
+        digest = hashlib.md5(self.key.encode('utf-8')).hexdigest()[:8]
+        if etag.endswith('"'):
+            return '{}-{}"'.format(etag[:-1], digest)
+        return '{}-{}'.format(etag, digest)
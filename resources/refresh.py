@@ -0,0 +1,67 @@
+# ## Background Refresh
+# A bounded pool of worker threads for re-rendering stale representations.
+# At most one refresh per key is pending or running at a time in a process,
+# and tasks are dropped rather than queued without bound when the pool is
+# saturated. Across processes, refreshes are claimed in the shared cache
+# before they are submitted, see `Resource.claim_refresh`.
+#
+# Threads do not survive a `fork`, so the pool restarts its workers when it
+# is first used in a new process, e.g. a prefork worker.
+import os
+import logging
+import threading
+
+try:
+    from Queue import Queue, Full
+except ImportError:
+    from queue import Queue, Full
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshPool(object):
+    def __init__(self, workers=2, maxsize=100):
+        self.workers = workers
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _start(self):
+        self._queue = Queue(self.maxsize)
+        self._pending = set()
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+        self._pid = os.getpid()
+
+    def _work(self):
+        while True:
+            key, func, args, kwargs = self._queue.get()
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                logger.exception('Refresh of {!r} failed'.format(key))
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+    # Schedules `func` to be called with `args` and `kwargs` unless a task
+    # for `key` is already pending. Returns `True` if the task was scheduled.
+    def submit(self, key, func, *args, **kwargs):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            if key in self._pending:
+                return False
+            try:
+                self._queue.put_nowait((key, func, args, kwargs))
+            except Full:
+                return False
+            self._pending.add(key)
+            return True
+
+    # Number of refreshes pending or running in this process
+    def pending(self):
+        with self._lock:
+            return len(self._pending) if self._pid == os.getpid() else 0
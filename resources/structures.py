@@ -1,3 +1,8 @@
+import time
+import threading
+from collections import OrderedDict
+
+
 class NameDescriptor(object):
     def __set__(self, instance, value):
         self.name = value
@@ -26,3 +31,88 @@ class AttrDict(object):
     def __iter__(self):
         return self.__dict__.__iter__()
 
+
+class Registry(object):
+    "A named, immutable set of constants indexed by name, value and code"
+
+    # Constants are set as attributes by their name in both upper and lower
+    # case, so `codes.not_found` is a plain attribute lookup. Iteration yields
+    # the names in definition order.
+    def __init__(self, name, items):
+        attrs = self.__dict__
+        attrs['name'] = name
+        attrs['_names'] = tuple(key for key, value in items)
+        attrs['_index'] = index = {}
+
+        for key, value in items:
+            attrs[key] = attrs[key.lower()] = value
+            index[key] = index[key.lower()] = index[value] = value
+            if hasattr(value, 'code'):
+                index[value.code] = value
+
+    def __repr__(self):
+        return u'<Registry: %s>' % self.name
+
+    # Only called for names that are not defined, e.g. mixed case names
+    def __getattr__(self, key):
+        return self._index.get(key.upper(), None)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('{} is immutable'.format(self.name))
+
+    def __delattr__(self, key):
+        raise AttributeError('{} is immutable'.format(self.name))
+
+    # Lookup by name, value or, for statuses, the integer code,
+    # e.g. `codes[404]`
+    def __getitem__(self, key):
+        return self._index[key]
+
+    # Names are matched case-insensitively, like attribute lookups
+    def __contains__(self, key):
+        return key in self._index or (hasattr(key, 'upper') and
+            key.upper() in self._index)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+
+class LRUCache(object):
+    "A thread-safe dict-like object which discards the least recently used keys"
+
+    # Entries may be given a `timeout` in seconds, after which they are
+    # treated as missing. This makes it usable as an in-process cache
+    # backend with the same interface as `SharedMemoryCache`.
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return u'<LRUCache: {}/{}>'.format(len(self._data), self.maxsize)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            expires, value = self._data.pop(key)
+            if expires and expires < time.time():
+                return default
+            self._data[key] = (expires, value)
+            return value
+
+    def set(self, key, value, timeout=None):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.time() + timeout if timeout else 0, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
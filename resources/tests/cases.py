@@ -1,3 +1,4 @@
+import os
 import unittest
 from werkzeug.test import EnvironBuilder
 from werkzeug.wrappers import Request
@@ -226,7 +227,838 @@ class ResourceTestCase(unittest.TestCase):
             response = resource(request)
             self.assertEqual(response.status_code, 200)
 
+    def test_patch(self):
+        "Test applying JSON Patch and JSON Merge Patch entities."
+        import json
+
+        document = {'title': 'Learn Python', 'tags': ['python'], 'pages': 100}
+        updates = []
+
+        class DocumentResource(Resource):
+            supported_patch_types = ('application/json-patch+json',
+                'application/merge-patch+json')
+
+            def get_etag(self, request, *args, **kwargs):
+                return str(hash(json.dumps(document, sort_keys=True)))
+
+            def patch(self, request, response, *args, **kwargs):
+                changed = self.apply_patch(request, response, document)
+                if changed is not None:
+                    updates.append(changed)
+                    response.status = codes.no_content
+
+        resource = DocumentResource()
+
+        self.params['method'] = 'PATCH'
+        self.params['content_type'] = 'application/json-patch+json'
+        self.params['data'] = json.dumps([
+            {'op': 'add', 'path': '/tags/-', 'value': 'books'},
+            {'op': 'test', 'path': '/pages', 'value': 100},
+        ])
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(document['tags'], ['python', 'books'])
+        self.assertEqual(updates.pop(), set(['tags']))
+
+        # Failed operations leave the document untouched
+        self.params['data'] = json.dumps([
+            {'op': 'replace', 'path': '/title', 'value': 'Learn Ruby'},
+            {'op': 'remove', 'path': '/author'},
+        ])
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(document['title'], 'Learn Python')
+
+        # Fields added before a failed operation are removed
+        self.params['data'] = json.dumps([
+            {'op': 'add', 'path': '/author', 'value': 'Zed Shaw'},
+            {'op': 'test', 'path': '/pages', 'value': 0},
+        ])
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue('author' not in document)
+
+        # Tests compare JSON types
+        self.params['data'] = json.dumps([
+            {'op': 'test', 'path': '/pages', 'value': 100.0},
+            {'op': 'test', 'path': '/tags/0', 'value': 'python'},
+            {'op': 'test', 'path': '/pages', 'value': True},
+        ])
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 409)
+
+        # The whole document can be copied
+        self.params['data'] = json.dumps([{'op': 'copy', 'from': '', 'path': '/copy'}])
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(document.pop('copy'), {'title': 'Learn Python',
+            'tags': ['python', 'books'], 'pages': 100})
+        self.assertEqual(updates.pop(), set(['copy']))
+
+        self.params['data'] = json.dumps([{'op': 'rename', 'path': '/title'}])
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 422)
+
+        # Merge patch, conditional on the current ETag
+        etag = resource.get_etag(request)
+        self.params['content_type'] = 'application/merge-patch+json'
+        self.params['data'] = json.dumps({'pages': 120, 'title': 'Learn Python'})
+        self.params['headers'] = {'If-Match': etag}
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(updates.pop(), set(['pages']))
+
+        # Stale ETag
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 412)
+
+        self.params['content_type'] = 'application/json'
+        self.params['headers'] = None
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 415)
+
+    def test_profiler(self):
+        "Test slow requests are profiled and retained."
+        import time
+        from resources.profiling import Profiler
+
+        class SlowResource(Resource):
+            profiler = Profiler(sample_rate=1, threshold=0.05, keep=2)
+
+            def get(self, request, response, *args, **kwargs):
+                time.sleep(float(request.args.get('delay', 0)))
+                return '{}'
+
+        resource = SlowResource()
+
+        for delay in ('0', '0.06', '0.1', '0.08'):
+            self.params['query_string'] = {'delay': delay}
+            environ = EnvironBuilder(**self.params)
+            request = environ.get_request(cls=Request)
+            response = resource(request)
+            self.assertEqual(response.status_code, 200)
+
+        profiles = SlowResource.profiler.profiles('SlowResource', 'GET')
+        self.assertEqual(len(profiles), 2)
+        self.assertTrue(profiles[0].duration >= 0.1)
+        self.assertTrue(profiles[1].duration >= 0.08)
+        self.assertEqual(SlowResource.profiler.profiles(method='POST'), [])
+
+        # Requests over the threshold are captured by the stack sampler even
+        # if they are not sampled
+        SlowResource.profiler.clear()
+        SlowResource.profiler.sample_rate = 0
+        for delay in ('0', '0.1'):
+            self.params['query_string'] = {'delay': delay}
+            environ = EnvironBuilder(**self.params)
+            response = resource(environ.get_request(cls=Request))
+        profiles = SlowResource.profiler.profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertTrue(profiles[0].duration >= 0.1)
+        self.assertTrue(any(func[2] == 'get' for func in profiles[0].stats.stats))
+
+        # Requests are not profiled unless sampled or over the threshold
+        SlowResource.profiler.clear()
+        SlowResource.profiler.threshold = None
+        response = resource(request)
+        self.assertEqual(SlowResource.profiler.profiles(), [])
+
+    def test_versioned_handlers(self):
+        "Test dispatching to handlers by the media type version."
+        from resources.models import versioned
+
+        class BookResource(Resource):
+            def get_v1(self, request, response, *args, **kwargs):
+                return '{"version": 1}'
+
+            def get_v2(self, request, response, *args, **kwargs):
+                return '{"version": 2}'
+
+            @versioned('PUT', 1)
+            def put_legacy(self, request, response, *args, **kwargs):
+                response.status = codes.no_content
+
+        self.assertEqual(set(BookResource.allowed_methods),
+            set(['GET', 'HEAD', 'OPTIONS', 'PUT']))
+
+        resource = BookResource()
+
+        # Latest version by default
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b'{"version": 2}')
+        self.assertEqual(response.headers['Content-Type'], 'application/json; version=2')
+        self.assertEqual(response.headers['Vary'], 'Accept')
+
+        self.params['headers'] = {'Accept': 'application/json; version=1'}
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.data, b'{"version": 1}')
+
+        self.params['headers'] = {'Accept': 'application/json; version=3'}
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 406)
+
+        # Handlers restricted to a mimetype
+        class ReportResource(Resource):
+            supported_accept_types = ('application/json', 'application/xml')
+
+            @versioned('GET', 1, 'application/xml')
+            def get_xml(self, request, response, *args, **kwargs):
+                return '<version>1</version>'
+
+            def get_v2(self, request, response, *args, **kwargs):
+                return '{"version": 2}'
+
+        report = ReportResource()
+
+        self.params['headers'] = {'Accept': 'application/xml'}
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = report(request)
+        self.assertEqual(response.data, b'<version>1</version>')
+        self.assertEqual(response.headers['Content-Type'], 'application/xml; version=1')
+
+        self.params['headers'] = {'Accept': 'application/json; version=1'}
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = report(request)
+        self.assertEqual(response.status_code, 406)
+
+        class XMLOnlyResource(Resource):
+            supported_accept_types = ('application/json', 'application/xml')
+
+            @versioned('GET', 1, 'application/xml')
+            def get_xml(self, request, response, *args, **kwargs):
+                return '<version>1</version>'
+
+        self.params['headers'] = {'Accept': 'application/json'}
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = XMLOnlyResource()(request)
+        self.assertEqual(response.status_code, 406)
+
+        self.params['method'] = 'PUT'
+        self.params['headers'] = None
+        self.params['content_type'] = 'application/json; version=1'
+        self.params['data'] = '{}'
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 204)
+
+    def test_projection(self):
+        "Test sparse fieldsets and embedded relations."
+        import json
+
+        class AuthorResource(Resource):
+            def get(self, request, response, *args, **kwargs):
+                author = {'id': 1, 'first_name': 'Zed', 'last_name': 'Shaw'}
+                return self.get_projection(request, response).filter(author)
+
+        class BookResource(Resource):
+            author = AuthorResource()
+
+            def get_etag(self, request, *args, **kwargs):
+                return '"abc"'
+
+            def get(self, request, response, *args, **kwargs):
+                projection = self.get_projection(request, response)
+                book = {'id': 1, 'title': 'Learn Python The Hard Way',
+                    'publish_date': '2010-05-01'}
+                if 'author' in projection:
+                    if projection.embeds('author'):
+                        book['author'] = self.author.apply(request,
+                            projection=projection.nested('author'))
+                    else:
+                        book['author'] = {'id': 1, 'url': '/author/1'}
+                response.headers['ETag'] = projection.tag(self.get_etag(request))
+                return json.dumps(projection.filter(book))
+
+        resource = BookResource()
+
+        self.params['query_string'] = 'fields=title,author.first_name&embed=author'
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data.decode('utf-8')), {
+            'title': 'Learn Python The Hard Way',
+            'author': {'first_name': 'Zed'},
+        })
+        etag = response.headers['ETag']
+        self.assertNotEqual(etag, '"abc"')
+
+        # The projection is part of the entity tag
+        self.params['headers'] = {'If-None-Match': etag}
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 304)
+
+        self.params['query_string'] = 'fields=id'
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data.decode('utf-8')), {'id': 1})
+
+        self.params['query_string'] = None
+        self.params['headers'] = {'If-None-Match': '"abc"'}
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 304)
+
+        # Resources without a GET handler cannot be embedded
+        self.assertEqual(Resource().apply(request), None)
+
+    def test_bulk_ingest(self):
+        "Test streaming NDJSON items to the batch handler."
+        import json
+
+        batches = []
+
+        class CollectionResource(Resource):
+            supported_content_types = ('application/json', 'application/x-ndjson')
+            bulk_batch_size = 2
+
+            def post(self, request, response, *args, **kwargs):
+                response.status = codes.created
+
+            def post_batch(self, request, response, items, *args, **kwargs):
+                batches.append(items)
+                return [codes.created if 'title' in item else
+                    (codes.unprocessable_entity, 'title is required')
+                    for item in items]
+
+        resource = CollectionResource()
+
+        self.params['method'] = 'POST'
+        self.params['content_type'] = 'application/x-ndjson'
+        self.params['data'] = '{"title": "a"}\n{"title": "b"}\n\n{"id": 3}\n{"title"\n'
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+
+        report = [json.loads(line) for line in
+            response.get_data().decode('utf-8').splitlines()]
+        self.assertEqual([item['status'] for item in report], [201, 201, 422, 400])
+        self.assertEqual(report[2]['detail'], 'title is required')
+        self.assertEqual(batches, [[{'title': 'a'}, {'title': 'b'}], [{'id': 3}]])
+
+        # A failed batch is reported and the following batches are processed
+        class FlakyCollectionResource(CollectionResource):
+            def post_batch(self, request, response, items, *args, **kwargs):
+                if any(item.get('title') == 'fail' for item in items):
+                    raise RuntimeError('Database unavailable')
+                return CollectionResource.post_batch(self, request, response,
+                    items, *args, **kwargs)
+
+        del batches[:]
+        self.params['data'] = '{"title": "a"}\n{"title": "fail"}\n{"title": "c"}\n'
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = FlakyCollectionResource()(request)
+        self.assertEqual(response.status_code, 200)
+        report = [json.loads(line) for line in
+            response.get_data().decode('utf-8').splitlines()]
+        self.assertEqual([item['status'] for item in report], [500, 500, 201])
+        self.assertEqual(report[0]['error'], 'The batch could not be processed')
+        self.assertEqual(batches, [[{'title': 'c'}]])
+
+        # NDJSON must be registered as a supported content type
+        class JSONCollectionResource(CollectionResource):
+            supported_content_types = ('application/json',)
+
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = JSONCollectionResource()(request)
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(len(batches), 1)
+
+    def test_delta_encoding(self):
+        "Test delta encoded responses against a retained representation."
+        import json
+        from resources.patch import JSONPatch
+        from resources.structures import LRUCache
+
+        books = [{'id': i, 'title': 'Book {}'.format(i)} for i in xrange(0, 20)]
+
+        class CollectionResource(Resource):
+            delta_history = 2
+
+            def get_etag(self, request, *args, **kwargs):
+                return '"{}"'.format(len(books))
+
+            def get(self, request, response, *args, **kwargs):
+                response.headers['ETag'] = self.get_etag(request)
+                return json.dumps(books)
+
+        resource = CollectionResource()
+
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 200)
+        previous = json.loads(response.data.decode('utf-8'))
+        etag = response.headers['ETag']
+
+        books.append({'id': 20, 'title': 'Book 20'})
+
+        self.params['headers'] = {'If-None-Match': etag, 'A-IM': 'json-patch'}
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 226)
+        self.assertEqual(response.headers['Delta-Base'], etag)
+        self.assertEqual(response.headers['ETag'], '"21"')
+        JSONPatch(json.loads(response.data.decode('utf-8'))).apply(previous)
+        self.assertEqual(previous, books)
+
+        # Without A-IM the full representation is returned
+        self.params['headers'] = {'If-None-Match': etag}
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 200)
+
+        # The base version has been evicted
+        books.append({'id': 21, 'title': 'Book 21'})
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        resource(request)
+        self.params['headers'] = {'If-None-Match': etag, 'A-IM': 'json-patch'}
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data.decode('utf-8')), books)
+
+        # Cached representations are encoded against the entity tag they
+        # were rendered with
+        class CachedCollectionResource(CollectionResource):
+            cache = LRUCache(10)
+
+        resource = CachedCollectionResource()
+        self.params['headers'] = None
+        environ = EnvironBuilder(**self.params)
+        response = resource(environ.get_request(cls=Request))
+        previous = json.loads(response.data.decode('utf-8'))
+        etag = response.headers['ETag']
+
+        books.append({'id': 22, 'title': 'Book 22'})
+        self.params['headers'] = {'If-None-Match': etag, 'A-IM': 'json-patch'}
+        environ = EnvironBuilder(**self.params)
+        response = resource(environ.get_request(cls=Request))
+        self.assertEqual(response.status_code, 226)
+        self.assertEqual(response.headers['ETag'], etag)
+        JSONPatch(json.loads(response.data.decode('utf-8'))).apply(previous)
+        self.assertEqual(len(previous), 22)
+
+        # The cached body was not retained as the current version, so no
+        # delta is produced against it once the cache is refreshed
+        resource.cache = LRUCache(10)
+        books.append({'id': 23, 'title': 'Book 23'})
+        self.params['headers'] = {'If-None-Match': '"23"', 'A-IM': 'json-patch'}
+        environ = EnvironBuilder(**self.params)
+        response = resource(environ.get_request(cls=Request))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data.decode('utf-8')), books)
+
+    def test_registries(self):
+        "Test status and method lookups."
+        from resources.http import methods
+
+        self.assertEqual(codes.not_found, '404 Not Found')
+        self.assertTrue(codes.NOT_FOUND is codes.not_found)
+        self.assertTrue(codes[404] is codes.not_found)
+        self.assertTrue(codes['404 Not Found'] is codes.not_found)
+        self.assertEqual(codes.not_found.code, 404)
+        self.assertEqual(codes.not_found.reason, 'Not Found')
+        self.assertTrue(418 not in codes)
+        self.assertEqual(codes.Im_A_Teapot, None)
+
+        import copy
+        import pickle
+        for status in (copy.copy(codes.not_found), copy.deepcopy(codes.not_found),
+                pickle.loads(pickle.dumps(codes.not_found, 2))):
+            self.assertEqual(status, '404 Not Found')
+            self.assertEqual(status.code, 404)
+            self.assertEqual(status.reason, 'Not Found')
+            self.assertEqual(status.line, '404 Not Found')
+
+        self.assertEqual(methods.patch, 'PATCH')
+        self.assertTrue('patch' in methods)
+        self.assertTrue('Patch' in methods)
+        self.assertTrue('Not_Found' in codes)
+        self.assertTrue('404 Not Found' in codes)
+        self.assertTrue('Trace' not in methods)
+        self.assertEqual(list(methods), ['GET', 'HEAD', 'OPTIONS', 'POST',
+            'PUT', 'DELETE', 'PATCH'])
+        self.assertRaises(AttributeError, setattr, methods, 'TRACE', 'TRACE')
+
+        class NoContentResource(Resource):
+            def delete(self, request, response, *args, **kwargs):
+                response.status = codes.no_content
+
+        resource = NoContentResource()
+        self.params['method'] = 'DELETE'
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.status, '204 No Content')
+        self.assertTrue(type(response.status) is str)
+
+    def test_stale_while_revalidate(self):
+        "Test stale representations are served while refreshing in the background."
+        import time
+        from resources.structures import LRUCache
+
+        renders = []
+
+        class DashboardResource(Resource):
+            cache = LRUCache(10)
+            cache_soft_ttl = 0.2
+            cache_hard_ttl = 10
+
+            def get(self, request, response, *args, **kwargs):
+                renders.append(request.args.get('range'))
+                return '{{"render": {}}}'.format(len(renders))
+
+        resource = DashboardResource()
+        self.params['query_string'] = {'range': 'week'}
+
+        environ = EnvironBuilder(**self.params)
+        request = environ.get_request(cls=Request)
+        response = resource(request)
+        self.assertEqual(response.data, b'{"render": 1}')
+
+        # Fresh
+        response = resource(environ.get_request(cls=Request))
+        self.assertEqual(response.data, b'{"render": 1}')
+        self.assertTrue(response.headers['Cache-Control'].startswith('max-age='))
+        self.assertEqual(len(renders), 1)
+
+        # Stale, the refresh happens in the background
+        time.sleep(0.25)
+        response = resource(environ.get_request(cls=Request))
+        self.assertEqual(response.data, b'{"render": 1}')
+        self.assertTrue(response.headers['Cache-Control'].startswith('max-age=0'))
+
+        for _ in xrange(0, 50):
+            if resource._refresh_pool.pending() == 0:
+                break
+            time.sleep(0.02)
+        self.assertEqual(renders, ['week', 'week'])
+
+        response = resource(environ.get_request(cls=Request))
+        self.assertEqual(response.data, b'{"render": 2}')
+        self.assertEqual(len(renders), 2)
+
+    def test_refresh_claim(self):
+        "Test a stale representation is refreshed by one process sharing the cache."
+        import time
+        from resources.structures import LRUCache
+
+        renders = []
+
+        class DashboardResource(Resource):
+            cache = LRUCache(10)
+            cache_soft_ttl = 0.1
+            cache_hard_ttl = 10
+
+            def get(self, request, response, *args, **kwargs):
+                renders.append(None)
+                if len(renders) > 1:
+                    time.sleep(0.2)
+                return '{{"render": {}}}'.format(len(renders))
+
+        # Each instance has its own refresh pool, like a prefork worker
+        workers = [DashboardResource(), DashboardResource()]
+        environ = EnvironBuilder(**self.params)
+
+        workers[0](environ.get_request(cls=Request))
+        time.sleep(0.15)
+        for resource in workers:
+            response = resource(environ.get_request(cls=Request))
+            self.assertEqual(response.data, b'{"render": 1}')
+            self.assertTrue(response.headers['Cache-Control'].startswith('max-age=0'))
+
+        self.assertEqual(workers[0]._refresh_pool.pending(), 1)
+        self.assertFalse('_refresh_pool' in workers[1].__dict__)
+
+        for _ in xrange(0, 50):
+            if workers[0]._refresh_pool.pending() == 0:
+                break
+            time.sleep(0.02)
+        self.assertEqual(len(renders), 2)
+
+        response = workers[1](environ.get_request(cls=Request))
+        self.assertEqual(response.data, b'{"render": 2}')
+
+    def test_private_cache(self):
+        "Test cached representations are not shared between users."
+        from resources.structures import LRUCache
+
+        renders = []
+
+        class AccountResource(Resource):
+            cache = LRUCache(10)
+            cache_vary = ('Accept-Language',)
+
+            def get(self, request, response, *args, **kwargs):
+                user = request.headers.get('Authorization', 'anonymous')
+                renders.append(user)
+                return '{{"user": "{}", "render": {}}}'.format(user, len(renders))
+
+        class PrivateAccountResource(AccountResource):
+            cache = LRUCache(10)
+            cache_private = True
+
+        def get(resource, headers):
+            self.params['headers'] = headers
+            environ = EnvironBuilder(**self.params)
+            return resource(environ.get_request(cls=Request))
+
+        # Authenticated requests bypass the cache by default
+        resource = AccountResource()
+        for user in ('alice', 'bob', 'alice'):
+            response = get(resource, {'Authorization': user})
+            self.assertEqual(response.data, '{{"user": "{}", "render": {}}}'.format(
+                user, len(renders)).encode('utf-8'))
+            self.assertTrue('Cache-Control' not in response.headers)
+        self.assertEqual(renders, ['alice', 'bob', 'alice'])
+
+        # Unless enabled, in which case they are cached per user
+        del renders[:]
+        resource = PrivateAccountResource()
+        for user in ('alice', 'bob', 'alice', 'bob'):
+            response = get(resource, {'Authorization': user})
+            self.assertEqual(response.data, '{{"user": "{}", "render": {}}}'.format(
+                user, 1 if user == 'alice' else 2).encode('utf-8'))
+        self.assertEqual(renders, ['alice', 'bob'])
+        self.assertTrue(response.headers['Cache-Control'].startswith('private, max-age='))
+        self.assertTrue('Authorization' in response.vary)
+
+        # Listed request headers select the cached representation
+        del renders[:]
+        resource = AccountResource()
+        for language in ('en', 'fr', 'en'):
+            response = get(resource, {'Accept-Language': language})
+        self.assertEqual(len(renders), 2)
+        self.assertTrue('Accept-Language' in response.vary)
+        self.assertFalse(response.headers['Cache-Control'].startswith('private'))
+
+
+class SharedMemoryCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        from resources.cache import SharedMemoryCache
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(self.path)
+        self.cache = SharedMemoryCache(self.path, slots=16, slot_size=128, ways=4)
+
+    def tearDown(self):
+        self.cache.close()
+        os.remove(self.path)
+
+    def test_get_set(self):
+        "Test storing, replacing and deleting entries."
+        self.assertEqual(self.cache.get('etag:/books/1'), None)
+        self.assertTrue(self.cache.set('etag:/books/1', b'"abc"'))
+        self.assertEqual(self.cache.get('etag:/books/1'), b'"abc"')
+        self.cache.set('etag:/books/1', b'"def"')
+        self.assertEqual(self.cache.get('etag:/books/1'), b'"def"')
+        self.assertTrue(self.cache.delete('etag:/books/1'))
+        self.assertEqual(self.cache.get('etag:/books/1'), None)
+
+        # Values larger than a slot are not cached
+        self.assertFalse(self.cache.set('large', b'x' * 128))
+
+    def test_eviction(self):
+        "Test the table size is bounded and recently read entries survive."
+        self.cache.set('hot', b'1')
+        for i in xrange(0, 100):
+            self.cache.get('hot')
+            self.cache.set('key-{}'.format(i), b'1')
+        self.assertEqual(self.cache.get('hot'), b'1')
+        found = [self.cache.get('key-{}'.format(i)) for i in xrange(0, 100)]
+        self.assertTrue(len([f for f in found if f]) < 16)
+
+    def test_shared(self):
+        "Test entries are visible to other processes."
+        pid = os.fork()
+        if pid == 0:
+            self.cache.set('child', b'forked')
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+        from resources.cache import SharedMemoryCache
+        cache = SharedMemoryCache(self.path, slots=16, slot_size=128, ways=4)
+        self.assertEqual(cache.get('child'), b'forked')
+        cache.close()
+
+
+class LoadHarnessTestCase(unittest.TestCase):
+    def test_concurrent_results(self):
+        "Test responses under concurrency match serial execution."
+        from resources.tests import load
+        results = load.run(concurrency=(1, 4), count=40, workers=2)
+        self.assertEqual([(r['mode'], r['concurrency']) for r in results],
+            [('threaded', 1), ('threaded', 4), ('prefork', 1), ('prefork', 4)])
+        for result in results:
+            self.assertTrue(result['throughput'] > 0)
+            self.assertTrue(result['p50'] <= result['p99'])
+            self.assertTrue(result['efficiency'] > 0)
+        self.assertEqual([r['cores'] for r in results if r['mode'] == 'threaded'], [1, 1])
+        self.assertEqual(results[2]['cores'], 1)
+
+
+try:
+    import django
+except ImportError:
+    django = None
+
+
+@unittest.skipUnless(django, 'Django is not installed')
+class DjangoAdapterTestCase(unittest.TestCase):
+    def setUp(self):
+        from django.conf import settings
+        if not settings.configured:
+            settings.configure()
+            django.setup()
+        from django.test import RequestFactory
+        self.factory = RequestFactory()
+
+    def test_view(self):
+        "Test processing Django requests and responses natively."
+        import json
+        from django.http import HttpResponse
+        from resources.adapters.django import view
+
+        class BookResource(Resource):
+            supported_content_types = ('application/json', 'application/x-ndjson')
+
+            def get_etag(self, request, *args, **kwargs):
+                return '"1"'
+
+            def get_v1(self, request, response, *args, **kwargs):
+                return json.dumps({'pk': kwargs['pk'], 'fields': request.args.getlist('fields')})
+
+            def put(self, request, response, *args, **kwargs):
+                response.status = codes.no_content
+
+            def post(self, request, response, *args, **kwargs):
+                response.status = codes.created
+
+            def post_batch(self, request, response, items, *args, **kwargs):
+                return [codes.created for item in items]
+
+        books = view(BookResource())
+
+        request = self.factory.get('/books/1', {'fields': 'title'},
+            HTTP_ACCEPT='application/json; version=1')
+        response = books(request, pk=1)
+        self.assertTrue(isinstance(response, HttpResponse))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode('utf-8')),
+            {'pk': 1, 'fields': ['title']})
+        self.assertEqual(response['Content-Type'], 'application/json; version=1')
+        self.assertEqual(response['Vary'], 'Accept')
+
+        request = self.factory.get('/books/1', HTTP_IF_NONE_MATCH='"1"')
+        self.assertEqual(books(request, pk=1).status_code, 304)
+
+        request = self.factory.put('/books/1', '{}', content_type='application/xml')
+        self.assertEqual(books(request, pk=1).status_code, 415)
+
+        request = self.factory.delete('/books/1')
+        response = books(request, pk=1)
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'GET, HEAD, OPTIONS, POST, PUT')
+
+        request = self.factory.post('/books/', '{"title": "a"}\n{"title": "b"}\n',
+            content_type='application/x-ndjson')
+        response = books(request)
+        self.assertEqual(b''.join(response.streaming_content).count(b'201'), 2)
+
+    def test_cache(self):
+        "Test serving cached representations through the adapter."
+        from resources.adapters.django import view
+        from resources.structures import LRUCache
+
+        renders = []
+
+        class BookResource(Resource):
+            cache = LRUCache(10)
+            cache_vary = ('Accept-Language',)
+
+            def get(self, request, response, *args, **kwargs):
+                renders.append(None)
+                return '{{"render": {}}}'.format(len(renders))
+
+        books = view(BookResource())
+
+        for _ in range(2):
+            response = books(self.factory.get('/books/1', HTTP_ACCEPT_LANGUAGE='en'))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, b'{"render": 1}')
+        self.assertEqual(response['Vary'], 'Accept-Language')
+        self.assertTrue(response['Cache-Control'].startswith('max-age='))
+
+        response = books(self.factory.get('/books/1', HTTP_ACCEPT_LANGUAGE='fr'))
+        self.assertEqual(response.content, b'{"render": 2}')
+
+        # Requests with credentials bypass the cache
+        response = books(self.factory.get('/books/1', HTTP_COOKIE='session=1'))
+        self.assertEqual(response.content, b'{"render": 3}')
+
+    def test_csrf_exempt(self):
+        "Test unsafe requests are not rejected by the CSRF middleware."
+        from django.middleware.csrf import CsrfViewMiddleware
+        from resources.adapters.django import view
+
+        class BookResource(Resource):
+            def post(self, request, response, *args, **kwargs):
+                response.status = codes.created
+
+        books = view(BookResource())
+        middleware = CsrfViewMiddleware(books)
+
+        request = self.factory.post('/books/', '{}', content_type='application/json')
+        self.assertEqual(middleware.process_view(request, lambda request: None,
+            (), {}).status_code, 403)
+        self.assertEqual(middleware.process_view(request, books, (), {}), None)
+        self.assertEqual(books(request).status_code, 201)
+
 
 if __name__ == '__main__':
-    suite = unittest.TestLoader().loadTestsFromTestCase(ResourceTestCase)
-    unittest.TextTestRunner(verbosity=2).run(suite)
+    unittest.main(verbosity=2)
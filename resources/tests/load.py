@@ -0,0 +1,307 @@
+# ## Load Harness
+# Runs a set of sample resources in a local WSGI server and drives them with
+# concurrent clients at increasing concurrency. Both a threaded server and a
+# prefork server (one process per worker accepting on a shared socket) are
+# supported. Clients run in separate processes so they do not compete with a
+# threaded server for its interpreter lock. For each run, the throughput,
+# p50/p99 latency and scaling efficiency are reported, and the responses are
+# checked against those of a serial run.
+#
+# Efficiency is the throughput relative to that of a single worker process
+# at the same concurrency, per core the server can use: one for the threaded
+# server, since Python code in a process runs on one core at a time, and
+# the number of busy workers for the prefork server, up to the number of
+# cores. Clients share the cores with the server, so run the harness on a
+# machine with cores to spare for the clients.
+#
+#     python -m resources.tests.load --mode both --concurrency 1,2,4,8
+import os
+import sys
+import json
+import time
+import signal
+import hashlib
+import argparse
+import threading
+import multiprocessing
+from werkzeug.serving import make_server, WSGIRequestHandler
+from werkzeug.wrappers import Request
+from resources.models import Resource
+from resources.http import codes
+
+try:
+    from httplib import HTTPConnection
+except ImportError:
+    from http.client import HTTPConnection
+
+
+# ## Sample Resources
+# Each resource produces a deterministic representation for a given request
+# so responses under concurrency can be compared with a serial run.
+class EchoResource(Resource):
+    def get(self, request, response, *args, **kwargs):
+        return json.dumps({'path': request.path,
+            'args': sorted(request.args.items())}, sort_keys=True)
+
+
+class ComputeResource(Resource):
+    "CPU-bound representation for exposing GIL contention."
+
+    def get_etag(self, request, *args, **kwargs):
+        return '"{}"'.format(request.args.get('n', '0'))
+
+    def get(self, request, response, *args, **kwargs):
+        n = int(request.args.get('n', 0))
+        digest = hashlib.sha1()
+        for i in range(n):
+            digest.update(str(i).encode('utf-8'))
+        response.headers['ETag'] = self.get_etag(request)
+        return json.dumps({'n': n, 'digest': digest.hexdigest()})
+
+
+class WriteResource(Resource):
+    def post(self, request, response, *args, **kwargs):
+        response.status = codes.created
+        return json.dumps({'length': len(request.get_data())})
+
+
+resources = {
+    '/echo': EchoResource(),
+    '/compute': ComputeResource(),
+    '/write': WriteResource(),
+}
+
+
+def application(environ, start_response):
+    request = Request(environ)
+    resource = resources.get(request.path)
+    if resource is None:
+        start_response(codes.not_found.line, [('Content-Length', '0')])
+        return [b'']
+    return resource(request)(environ, start_response)
+
+
+# The request mix used by each client; entries are (method, path, body)
+def workload(count):
+    requests = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            requests.append(('GET', '/echo?i={}'.format(i), None))
+        elif kind == 1:
+            requests.append(('GET', '/compute?n={}'.format(1000 + i % 7 * 100), None))
+        elif kind == 2:
+            requests.append(('OPTIONS', '/compute', None))
+        else:
+            requests.append(('POST', '/write', json.dumps({'i': i})))
+    return requests
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+# ## Servers
+# `start` returns the port of the running server and a function which
+# stops it.
+def start(mode, workers):
+    server = make_server('127.0.0.1', 0, application, threaded=(mode == 'threaded'),
+        request_handler=QuietHandler)
+    # Allow a backlog for high concurrency, the default is only 5
+    server.socket.listen(128)
+    port = server.socket.getsockname()[1]
+
+    if mode == 'threaded':
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+        return port, stop
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, lambda *args: os._exit(0))
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def stop():
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+        for pid in children:
+            os.waitpid(pid, 0)
+        server.server_close()
+
+    return port, stop
+
+
+# ## Clients
+# Each client process takes the next request from the shared `counter`
+# until all `requests` are sent, once `go` is set. It puts its start and end
+# time and a list of `(index, latency, status, body)` on `results`, or an
+# error message if a request failed.
+def client(port, requests, counter, ready, go, results):
+    ready.put(os.getpid())
+    go.wait()
+    start = time.time()
+    sent = []
+    try:
+        while True:
+            with counter.get_lock():
+                index = counter.value
+                counter.value += 1
+            if index >= len(requests):
+                break
+            method, path, body = requests[index]
+            headers = {'Content-Type': 'application/json'} if body else {}
+            begin = time.time()
+            connection = HTTPConnection('127.0.0.1', port, timeout=30)
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            status, data = response.status, response.read()
+            connection.close()
+            sent.append((index, time.time() - begin, status, data))
+    except Exception as e:
+        results.put(('error', '{}: {}'.format(type(e).__name__, e)))
+        return
+    results.put((start, time.time(), sent))
+
+
+# Sends `requests` using `concurrency` client processes. Returns the elapsed
+# time, the latency of each request and each response as
+# `(status, body)`, indexed like `requests`.
+def drive(port, requests, concurrency):
+    counter = multiprocessing.Value('i', 0)
+    ready = multiprocessing.Queue()
+    go = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    clients = [multiprocessing.Process(target=client,
+        args=(port, requests, counter, ready, go, results))
+        for _ in range(concurrency)]
+
+    for process in clients:
+        process.daemon = True
+        process.start()
+    # Start timing once every client is running
+    for _ in clients:
+        ready.get(timeout=30)
+    go.set()
+    outputs = [results.get(timeout=120) for _ in clients]
+    for process in clients:
+        process.join()
+
+    for output in outputs:
+        if output[0] == 'error':
+            raise RuntimeError('Client failed: {}'.format(output[1]))
+
+    latencies = [None] * len(requests)
+    responses = [None] * len(requests)
+    for _, _, sent in outputs:
+        for index, latency, status, data in sent:
+            latencies[index] = latency
+            responses[index] = (status, data)
+    elapsed = max(output[1] for output in outputs) - \
+        min(output[0] for output in outputs)
+    return elapsed, latencies, responses
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+# Returns the throughput of a single worker process at each concurrency level.
+def single_worker(requests, concurrency):
+    port, stop = start('prefork', 1)
+    try:
+        # Warm up, like the serial run does for the measured servers
+        drive(port, requests, 1)
+        return dict((level, len(requests) / drive(port, requests, level)[0])
+            for level in concurrency)
+    finally:
+        stop()
+
+
+# ## Run
+# Runs the workload for each mode and concurrency level and returns a list
+# of result dicts. `cores` is the number of cores the server can use for
+# the run. Raises an `AssertionError` if any response under concurrency
+# differs from the serial run.
+def run(modes=('threaded', 'prefork'), concurrency=(1, 2, 4, 8), count=400,
+        workers=None):
+    cpus = multiprocessing.cpu_count()
+    workers = workers or cpus
+    requests = workload(count)
+    baseline = single_worker(requests, concurrency)
+    results = []
+
+    for mode in modes:
+        port, stop = start(mode, workers)
+        try:
+            _, _, expected = drive(port, requests, 1)
+
+            for level in concurrency:
+                elapsed, latencies, responses = drive(port, requests, level)
+
+                for index, (response, serial) in enumerate(zip(responses, expected)):
+                    if response != serial:
+                        raise AssertionError('{} {} under concurrency {} ({}) returned '
+                            '{!r}, expected {!r}'.format(requests[index][0],
+                            requests[index][1], level, mode, response, serial))
+
+                cores = 1 if mode == 'threaded' else min(level, workers, cpus)
+                throughput = count / elapsed
+                results.append({
+                    'mode': mode,
+                    'concurrency': level,
+                    'cores': cores,
+                    'throughput': throughput,
+                    'p50': percentile(latencies, 0.5),
+                    'p99': percentile(latencies, 0.99),
+                    'efficiency': throughput / (baseline[level] * cores),
+                })
+        finally:
+            stop()
+
+    return results
+
+
+def report(results, stream=sys.stdout):
+    stream.write('{:<10} {:>11} {:>6} {:>12} {:>9} {:>9} {:>11}\n'.format('mode',
+        'concurrency', 'cores', 'requests/s', 'p50 ms', 'p99 ms', 'efficiency'))
+    for result in results:
+        stream.write('{mode:<10} {concurrency:>11} {cores:>6} {throughput:>12.1f} '
+            '{p50_ms:>9.2f} {p99_ms:>9.2f} {efficiency:>10.0%}\n'.format(
+            p50_ms=result['p50'] * 1000, p99_ms=result['p99'] * 1000, **result))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Resource throughput and '
+        'scaling harness')
+    parser.add_argument('--mode', choices=('threaded', 'prefork', 'both'),
+        default='both')
+    parser.add_argument('--concurrency', default='1,2,4,8',
+        help='comma-separated client concurrency levels')
+    parser.add_argument('--requests', type=int, default=400,
+        help='number of requests per concurrency level')
+    parser.add_argument('--workers', type=int, default=None,
+        help='number of prefork workers, defaults to the number of cores')
+    args = parser.parse_args(argv)
+
+    modes = ('threaded', 'prefork') if args.mode == 'both' else (args.mode,)
+    concurrency = [int(level) for level in args.concurrency.split(',')]
+    report(run(modes, concurrency, args.requests, args.workers))
+
+
+if __name__ == '__main__':
+    main()